@@ -1,27 +1,203 @@
 import os
+import re
+import argparse
+import logging
+import multiprocessing
 from utilities.neo4j_handler_paths import CodeGraph
-from utilities.ast_to_json_parser import parse_parquet_to_json
-
-JSON_FILE = '/app/data/input.json'
-PARQUET_FILE_NAME = os.getenv("PARQUET_FILE_NAME", "output.parquet")
-PARQUET_FILE_PATH = f'/app/outputs/{PARQUET_FILE_NAME}'
-print("Starting graph builder...")
-print(f"Converting {PARQUET_FILE_NAME} to JSON...")
-
-parse_parquet_to_json(PARQUET_FILE_PATH, JSON_FILE, cross_calls=True)
-print("Conversion completed.")
-
-NEO4J_URI = os.getenv("NEO4J_URI", "bolt://neo4j:7687")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "docgentest")
-
-builder = CodeGraph(
-    json_file=JSON_FILE,
-    uri=NEO4J_URI,
-    user=NEO4J_USER,
-    password=NEO4J_PASSWORD
-)
-
-builder.clear_graph()
-builder.build_graph()
-print("Graph build completed!")
+from utilities.sqlite_graph import SQLiteCodeGraph
+from utilities.ast_to_json_parser import parse_parquet_to_json, input_hash
+from utilities.admin_import import export_admin_import_csvs
+from utilities.record_stream import NDJSONRecords, load_records
+from utilities.embeddings import get_embedder
+from utilities.build_report import BuildReport
+from utilities.body_store import BodyStore
+from utilities.graph_rows import GraphRowCollector
+
+parser = argparse.ArgumentParser(description="Build the Neo4j code graph from the processed parquet file.")
+parser.add_argument("--backend", choices=["neo4j", "sqlite"], default=os.getenv("GRAPH_BACKEND", "neo4j"),
+                    help="neo4j: load a running server; sqlite: embedded graph file, no server needed")
+parser.add_argument("--repo", default=os.getenv("GRAPH_REPO", "default"),
+                    help="repository key (name, optionally name@version) scoping every node and relationship; "
+                         "a build only replaces this repository's subgraph")
+parser.add_argument("--sqlite-path", default=os.getenv("GRAPH_SQLITE_PATH"),
+                    help="graph file for the sqlite backend (default: one file per repository in /app/data)")
+parser.add_argument("--mode", choices=["bulk", "per-row"], default=os.getenv("GRAPH_LOAD_MODE", "bulk"),
+                    help="bulk: UNWIND batches in explicit transactions; per-row: one auto-commit statement per row")
+parser.add_argument("--batch-size", type=int, default=int(os.getenv("GRAPH_BATCH_SIZE", "1000")),
+                    help="rows per UNWIND batch in bulk mode")
+parser.add_argument("--workers", type=int, default=int(os.getenv("GRAPH_WRITE_WORKERS", "1")),
+                    help="concurrent write transactions (sessions) used by the loader")
+parser.add_argument("--no-resume", dest="resume", action="store_false",
+                    default=os.getenv("GRAPH_RESUME", "1").lower() not in ("0", "false", "no"),
+                    help="always clear the repository first instead of resuming an interrupted build of the same input")
+parser.add_argument("--reach-hops", type=int, default=int(os.getenv("GRAPH_REACH_HOPS", "3")),
+                    help="call/import depth of the reachability counts stored by the centrality pass")
+parser.add_argument("--incremental", action="store_true", default=os.getenv("GRAPH_INCREMENTAL", "").lower() in ("1", "true", "yes"),
+                    help="keep the existing graph and only reload files whose content hash changed")
+parser.add_argument("--parse-workers", type=int, default=int(os.getenv("GRAPH_PARSE_WORKERS", str(os.cpu_count() or 1))),
+                    help="processes used for AST extraction")
+parser.add_argument("--parse-batch-size", type=int, default=int(os.getenv("GRAPH_PARSE_BATCH_SIZE", "1024")),
+                    help="parquet rows read per record batch")
+parser.add_argument("--ast-cache", default=os.getenv("GRAPH_AST_CACHE", "/app/outputs/ast_cache.sqlite"),
+                    help="persistent AST extraction cache on the shared outputs volume ('' or 'none' disables it)")
+parser.add_argument("--ast-cache-max-mb", type=int, default=int(os.getenv("GRAPH_AST_CACHE_MAX_MB", "512")),
+                    help="least recently used cache entries are evicted beyond this size")
+parser.add_argument("--export-csv", metavar="DIR", default=os.getenv("GRAPH_EXPORT_CSV_DIR"),
+                    help="write neo4j-admin import CSVs to DIR instead of loading into a running Neo4j")
+parser.add_argument("--export-snapshot", metavar="DIR", default=os.getenv("GRAPH_EXPORT_SNAPSHOT"),
+                    help="after the build, write the repository's graph to DIR as a parquet snapshot")
+parser.add_argument("--restore-snapshot", metavar="DIR", default=os.getenv("GRAPH_RESTORE_SNAPSHOT"),
+                    help="load the snapshot in DIR into the repository instead of parsing the parquet input")
+parser.add_argument("--intermediate", choices=["ndjson", "json"], default=os.getenv("GRAPH_INTERMEDIATE", "ndjson"),
+                    help="ndjson streams records from the parser into the loader; json writes a single document first")
+parser.add_argument("--embedder", choices=["none", "hashing", "azure"], default=os.getenv("GRAPH_EMBEDDER", "none"),
+                    help="embedding provider for the chunk text vector index; none skips embedding (hashing works offline)")
+parser.add_argument("--embed-code", action="store_true", default=os.getenv("GRAPH_EMBED_CODE", "").lower() in ("1", "true", "yes"),
+                    help="also embed Method and Function bodies")
+parser.add_argument("--body-store", metavar="PATH", default=os.getenv("GRAPH_BODY_STORE"),
+                    help="keep chunk/method/function text in this SQLite body store and only its hash in the graph")
+parser.add_argument("--no-fulltext", dest="fulltext", action="store_false",
+                    default=os.getenv("GRAPH_FULLTEXT", "1").lower() not in ("0", "false", "no"),
+                    help="do not create the full-text indexes behind SearchCode; required with --body-store")
+parser.add_argument("--log-level", default=os.getenv("GRAPH_LOG_LEVEL", "INFO"),
+                    help="DEBUG also logs every file and chunk as it is queued")
+parser.add_argument("--profile", action="store_true", default=os.getenv("GRAPH_PROFILE", "").lower() in ("1", "true", "yes"),
+                    help="PROFILE every write to count db hits in the build report (slower)")
+parser.add_argument("--report", default=os.getenv("GRAPH_BUILD_REPORT", "/app/data/build_report.json"),
+                    help="where to write the JSON build report")
+
+
+def wait_for_parser(parse_process):
+    """Block until the background parser has exited; a failed parser aborts the build."""
+    if parse_process is None:
+        return
+    parse_process.join()
+    if parse_process.exitcode != 0:
+        raise SystemExit(f"Parser exited with code {parse_process.exitcode}")
+
+
+def main():
+    args = parser.parse_args()
+    if args.restore_snapshot and (args.export_csv or args.incremental):
+        parser.error("--restore-snapshot replaces the repository's graph; it cannot be combined with "
+                     "--export-csv or --incremental")
+    if args.incremental and args.backend == "sqlite":
+        parser.error("--incremental is not supported with --backend sqlite")
+    if args.body_store and args.fulltext and args.backend == "neo4j":
+        # The full-text indexes read the text on the nodes, which a body store leaves empty.
+        parser.error("--body-store moves chunk and code text out of the graph, so the full-text indexes "
+                     "would match nothing; pass --no-fulltext (GRAPH_FULLTEXT=0) to build without them")
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    report = BuildReport(
+        mode=args.mode, batch_size=args.batch_size, workers=args.workers, parse_workers=args.parse_workers,
+        intermediate=args.intermediate, incremental=args.incremental, embedder=args.embedder, repo=args.repo,
+        resume=args.resume, restore_snapshot=args.restore_snapshot, fulltext=args.fulltext,
+    )
+
+    JSON_FILE = '/app/data/input.ndjson' if args.intermediate == "ndjson" else '/app/data/input.json'
+    PARQUET_FILE_NAME = os.getenv("PARQUET_FILE_NAME", "output.parquet")
+    PARQUET_FILE_PATH = f'/app/outputs/{PARQUET_FILE_NAME}'
+    print("Starting graph builder...")
+    parse_process = None
+    if args.restore_snapshot:
+        records = []
+    else:
+        print(f"Converting {PARQUET_FILE_NAME} to {args.intermediate.upper()}...")
+        if os.path.exists(JSON_FILE):
+            os.remove(JSON_FILE)
+        parse_args = (PARQUET_FILE_PATH, JSON_FILE)
+        parse_kwargs = {
+            "cross_calls": True,
+            "workers": args.parse_workers,
+            "batch_size": args.parse_batch_size,
+            "cache_path": args.ast_cache if args.ast_cache.lower() not in ("", "none") else None,
+            "cache_max_bytes": args.ast_cache_max_mb * 1024 * 1024,
+        }
+        if args.intermediate == "ndjson" and not args.export_csv:
+            # Parse in the background and load records as soon as they are written.
+            parse_process = multiprocessing.Process(target=parse_parquet_to_json, args=parse_args, kwargs=parse_kwargs)
+            parse_process.start()
+            records = NDJSONRecords(JSON_FILE, follow=True, is_writing=parse_process.is_alive)
+        else:
+            report.set_section("parse", parse_parquet_to_json(*parse_args, **parse_kwargs))
+            print("Conversion completed.")
+            records = load_records(JSON_FILE)
+
+    body_store = BodyStore(args.body_store) if args.body_store else None
+
+    if args.export_csv:
+        with report.step("export_csv"):
+            import_args = export_admin_import_csvs(records, args.export_csv, repo=args.repo,
+                                                   collector=GraphRowCollector(body_store=body_store), report=report)
+        print("Load the export into a stopped Neo4j with:")
+        print("  " + " ".join(import_args))
+    elif args.backend == "sqlite":
+        # One graph file per repository, so builds of different repositories never share a file.
+        repo_file = re.sub(r"[^\w.@-]", "_", args.repo)
+        sqlite_path = args.sqlite_path or f"/app/data/graph-{repo_file}.sqlite"
+        builder = SQLiteCodeGraph(sqlite_path, data=records, batch_size=args.batch_size,
+                                  report=report, body_store=body_store, repo=args.repo, reach_hops=args.reach_hops)
+        if args.restore_snapshot:
+            builder.restore_snapshot(args.restore_snapshot)
+        else:
+            if builder.has_files():
+                # An existing graph is only cleared once the whole input has been parsed.
+                wait_for_parser(parse_process)
+            builder.clear_graph()
+            builder.build_graph()
+        wait_for_parser(parse_process)
+        if args.export_snapshot:
+            builder.export_snapshot(args.export_snapshot)
+        builder.close()
+        print("Graph build completed!")
+    else:
+        NEO4J_URI = os.getenv("NEO4J_URI", "bolt://neo4j:7687")
+        NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+        NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "docgentest")
+
+        builder = CodeGraph(
+            json_file=JSON_FILE,
+            uri=NEO4J_URI,
+            user=NEO4J_USER,
+            password=NEO4J_PASSWORD,
+            batch_size=args.batch_size,
+            data=records,
+            workers=args.workers,
+            profile=args.profile,
+            report=report,
+            body_store=body_store,
+            repo=args.repo,
+            reach_hops=args.reach_hops,
+            fulltext=args.fulltext,
+            input_hash=input_hash(PARQUET_FILE_PATH) if args.resume and not args.restore_snapshot else None
+        )
+
+        if args.restore_snapshot:
+            builder.restore_snapshot(args.restore_snapshot)
+        else:
+            if not args.incremental and not builder.load_checkpoint():
+                if builder.has_files():
+                    # An existing graph is only cleared once the whole input has been parsed;
+                    # incremental builds read the complete stream before deleting anything.
+                    wait_for_parser(parse_process)
+                builder.clear_graph()
+            builder.build_graph(bulk=args.mode == "bulk", incremental=args.incremental)
+        if parse_process is not None:
+            wait_for_parser(parse_process)
+            print("Conversion completed.")
+        if args.embedder != "none":
+            # After a restore only nodes without a vector from this embedder are embedded.
+            labels = ("ChunkContent", "Method", "Function") if args.embed_code else ("ChunkContent",)
+            builder.embed_nodes(get_embedder(args.embedder), labels=labels)
+        builder.clear_checkpoint()
+        if args.export_snapshot:
+            builder.export_snapshot(args.export_snapshot)
+        builder.close()
+        print("Graph build completed!")
+    if body_store is not None:
+        body_store.close()
+    report.write(args.report)
+
+
+if __name__ == "__main__":
+    main()
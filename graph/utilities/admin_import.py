@@ -0,0 +1,224 @@
+import csv
+import logging
+import os
+from collections import defaultdict
+from .build_report import BuildReport
+from .graph_rows import GraphRowCollector
+
+logger = logging.getLogger(__name__)
+
+# Node files: label, ID space, id column, extra labels per file type, and
+# (property, neo4j-admin type) columns in header order.
+NODE_FILES = {
+    "Folder": ("path", [("path", "string")]),
+    "File": ("path", [("path", "string"), ("content_hash", "string"), ("line_count", "int")]),
+    "Chunk": ("id", [
+        ("id", "string"), ("chunk_index", "int"), ("total_chunks", "int"), ("source_id", "string"),
+        ("content_type", "string"), ("start_offset", "int"), ("end_offset", "int"), ("content_hash", "string"),
+    ]),
+    "ChunkContent": ("hash", [
+        ("hash", "string"), ("content", "string"), ("char_count", "int"), ("word_count", "int"),
+        ("token_count", "int"), ("body_hash", "string"), ("body_length", "int"),
+    ]),
+    "Class": ("key", [
+        ("key", "string"), ("name", "string"), ("file", "string"), ("decorators", "string"),
+        ("inheritances", "string"), ("lineno", "int"), ("end_lineno", "int"),
+    ]),
+    "Method": ("key", [
+        ("key", "string"), ("name", "string"), ("class", "string"), ("file", "string"),
+        ("content", "string"), ("signature", "string"), ("decorators", "string"),
+        ("lineno", "int"), ("end_lineno", "int"), ("body_hash", "string"), ("body_length", "int"),
+    ]),
+    "Function": ("key", [
+        ("key", "string"), ("name", "string"), ("file", "string"), ("content", "string"),
+        ("signature", "string"), ("decorators", "string"), ("lineno", "int"), ("end_lineno", "int"),
+        ("body_hash", "string"), ("body_length", "int"),
+    ]),
+    "Library": ("name", [("name", "string")]),
+}
+
+FILE_TYPE_LABELS = {"markdown": "Markdown", "text": "TextFile", "yaml": "YAML"}
+
+# Relationship files: source phase -> (file name, type, start space, start column,
+# end space, end column).
+RELATIONSHIP_FILES = {
+    "folder_contains_folder": ("folder_contains_folder", "CONTAINS", "Folder", "parent", "Folder", "child"),
+    "folder_contains_file": ("folder_contains_file", "CONTAINS", "Folder", "folder", "File", "file"),
+    "file_contains_chunk": ("file_contains_chunk", "CONTAINS", "File", "file", "Chunk", "chunk_id"),
+    "chunk_has_content": ("chunk_has_content", "HAS_CONTENT", "Chunk", "chunk_id", "ChunkContent", "hash"),
+    "chunk_follows": ("chunk_follows", "FOLLOWS", "Chunk", "prev_id", "Chunk", "curr_id"),
+    "file_defines_class": ("file_defines_class", "DEFINES", "File", "file", "Class", "class_key"),
+    "class_defines_method": ("class_defines_method", "DEFINES", "Class", "class_key", "Method", "method_key"),
+    "file_defines_function": ("file_defines_function", "DEFINES", "File", "file", "Function", "function_key"),
+    "file_uses_library": ("file_uses_library", "USES", "File", "file", "Library", "module"),
+    "file_imports_file": ("file_imports_file", "IMPORTS", "File", "file", "File", "target"),
+}
+
+# Call phases -> (caller space, callee space).
+CALL_PHASES = {
+    "calls_method_method": ("Method", "Method"),
+    "calls_method_function": ("Method", "Function"),
+    "calls_function_function": ("Function", "Function"),
+    "calls_function_method": ("Function", "Method"),
+}
+
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _collect(records, collector, report):
+    """Gather node properties and relationship endpoints from the collector's rows.
+
+    Files whose rows cannot be collected are logged, counted as
+    ``file_errors`` in ``report`` and left out of the export.
+    """
+    nodes = {label: {} for label in NODE_FILES}
+    relationships = defaultdict(set)
+    calls = []
+    seen_folders = set()
+
+    for file_obj in records:
+        file_path = file_obj.get('file')
+        if not file_path:
+            continue
+        if file_obj.get('type') != 'calls':
+            report.count("files_processed")
+        try:
+            rows, _ = collector._collect_file_rows(file_obj, seen_folders)
+        except Exception as e:
+            logger.error("Error processing file %s: %s", file_path, e)
+            report.count("file_errors")
+            continue
+
+        for phase, row in rows:
+            if phase == "folders":
+                nodes["Folder"][row["path"]] = {"path": row["path"]}
+            elif phase == "files":
+                nodes["File"].setdefault(row["path"], {}).update(row)
+            elif phase == "file_hashes":
+                nodes["File"].setdefault(row["path"], {})["content_hash"] = row["content_hash"]
+            elif phase == "chunks":
+                nodes["Chunk"][row["id"]] = row
+            elif phase == "chunk_contents":
+                nodes["ChunkContent"][row["hash"]] = row
+            elif phase == "classes":
+                nodes["Class"][row["key"]] = row
+            elif phase == "methods":
+                nodes["Method"][row["key"]] = row
+            elif phase == "functions":
+                nodes["Function"][row["key"]] = row
+            elif phase == "file_uses_library":
+                nodes["Library"][row["module"]] = {"name": row["module"]}
+                relationships[phase].add((row["file"], row["module"]))
+            elif phase in RELATIONSHIP_FILES:
+                _, _, _, start_col, _, end_col = RELATIONSHIP_FILES[phase]
+                relationships[phase].add((row[start_col], row[end_col]))
+            elif phase in CALL_PHASES:
+                calls.append((phase, row))
+
+    # Imports may resolve to a file the parser skipped; keep only edges between exported files.
+    relationships["file_imports_file"] = {
+        (start, end) for start, end in relationships["file_imports_file"] if end in nodes["File"]
+    }
+
+    # Calls arrive resolved to keys; skip any whose endpoints were not exported.
+    call_edges = set()
+    for phase, row in calls:
+        caller_space, callee_space = CALL_PHASES[phase]
+        if row["caller_key"] not in nodes[caller_space] or row["callee_key"] not in nodes[callee_space]:
+            continue
+        call_edges.add((
+            caller_space, row["caller_key"], callee_space, row["callee_key"],
+            row["caller"], row.get("caller_class") if caller_space == "Method" else None, row["called"]
+        ))
+
+    return nodes, relationships, call_edges
+
+
+def export_admin_import_csvs(records, output_dir, collector=None, repo="default", report=None):
+    """Write node and relationship CSVs for ``neo4j-admin database import full``.
+
+    Every file carries its own header row, IDs live in one ID space per
+    label, and rows are sorted so the same input always produces the same
+    bytes. Returns the ``neo4j-admin`` arguments that load the files; the
+    import does not create constraints, so run ``CodeGraph.ensure_schema``
+    once the database is started. Every node and relationship gets a
+    ``repo`` column; a full import replaces the database, so it only suits
+    an instance that holds this one repository. Files skipped because their
+    rows could not be collected are counted as ``file_errors`` in ``report``.
+    """
+    collector = collector or GraphRowCollector()
+    report = report or BuildReport()
+    nodes, relationships, call_edges = _collect(records, collector, report)
+    os.makedirs(output_dir, exist_ok=True)
+    node_files = []
+    relationship_files = []
+
+    for label, (id_column, columns) in NODE_FILES.items():
+        file_name = f"nodes_{label.lower()}.csv"
+        header = []
+        for name, value_type in columns:
+            if name == id_column:
+                header.append(f"{name}:ID({label})")
+            else:
+                header.append(name if value_type == "string" else f"{name}:{value_type}")
+        header += ["repo", ":LABEL"]
+        with open(os.path.join(output_dir, file_name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for node_id in sorted(nodes[label]):
+                props = nodes[label][node_id]
+                labels = [label]
+                if label == "File" and props.get("type") in FILE_TYPE_LABELS:
+                    labels.append(FILE_TYPE_LABELS[props["type"]])
+                writer.writerow([_format(props.get(name)) for name, _ in columns] + [repo, ";".join(labels)])
+        node_files.append(file_name)
+
+    for phase, (name, rel_type, start_space, _, end_space, _) in RELATIONSHIP_FILES.items():
+        file_name = f"rels_{name}.csv"
+        with open(os.path.join(output_dir, file_name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow([f":START_ID({start_space})", f":END_ID({end_space})", ":TYPE", "repo"])
+            for start, end in sorted(relationships[phase]):
+                writer.writerow([start, end, rel_type, repo])
+        relationship_files.append(file_name)
+
+    # One CALLS file per (caller, callee) ID-space pair.
+    for caller_space, callee_space in sorted(set(CALL_PHASES.values())):
+        file_name = f"rels_calls_{caller_space.lower()}_{callee_space.lower()}.csv"
+        edges = sorted(
+            (edge for edge in call_edges if edge[0] == caller_space and edge[2] == callee_space),
+            key=lambda edge: tuple("" if v is None else v for v in edge)
+        )
+        # Only method callers carry caller_class, as in the online loader.
+        with_class = caller_space == "Method"
+        with open(os.path.join(output_dir, file_name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [f":START_ID({caller_space})", f":END_ID({callee_space})", ":TYPE", "repo", "caller_function"]
+                + (["caller_class"] if with_class else []) + ["called_function"]
+            )
+            for _, start, _, end, caller, caller_class, called in edges:
+                writer.writerow([start, end, "CALLS", repo, caller] + ([caller_class] if with_class else []) + [called])
+        relationship_files.append(file_name)
+
+    args = ["neo4j-admin", "database", "import", "full", "--multiline-fields=true", "--overwrite-destination"]
+    args += [f"--nodes={os.path.join(output_dir, name)}" for name in node_files]
+    args += [f"--relationships={os.path.join(output_dir, name)}" for name in relationship_files]
+    args.append("neo4j")
+
+    print(f"Exported {sum(len(n) for n in nodes.values())} nodes and "
+          f"{sum(len(r) for r in relationships.values()) + len(call_edges)} relationships to {output_dir}")
+    report.count("duplicate_definitions", collector.duplicate_definitions)
+    if collector.duplicate_definitions:
+        logger.warning("%d definitions were replaced by a same-named one in the same file",
+                       collector.duplicate_definitions)
+    skipped = report.counters.get("file_errors", 0)
+    if skipped:
+        logger.warning("%d files could not be processed and are missing from the export", skipped)
+    return args
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+class ASTCache:
+    """On-disk cache of per-file AST extractions, keyed by content hash and parser version.
+
+    Entries are zlib-compressed JSON in a SQLite file. Lookups refresh an
+    entry's ``last_used`` time, and ``close`` evicts least recently used
+    entries until the cache is back under ``max_bytes``. Only the parent
+    process reads and writes the cache; pool workers never touch it.
+
+    Concurrent builds may share the file: a writer waits up to ``timeout``
+    seconds for another build's lock, and an eviction that still cannot get
+    it is skipped until the next build closes the cache.
+    """
+
+    def __init__(self, path, version, max_bytes=512 * 1024 * 1024, timeout=30):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_by_last_used ON entries (last_used)")
+        self.pending = []
+        self.touched = []
+
+    def _key(self, content_hash):
+        return f"{self.version}:{content_hash}"
+
+    def get_many(self, content_hashes):
+        """Return ``{content hash: extraction JSON}`` for the cached hashes.
+
+        Text rather than objects: files with identical content share an
+        entry, and each record must get its own copy to annotate.
+        """
+        keys = {self._key(h): h for h in set(content_hashes)}
+        found = {}
+        key_list = list(keys)
+        # Stay below SQLite's bound-parameter limit.
+        for i in range(0, len(key_list), 500):
+            batch = key_list[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for key, data in self.connection.execute(
+                f"SELECT key, data FROM entries WHERE key IN ({placeholders})", batch
+            ):
+                found[keys[key]] = zlib.decompress(data).decode("utf-8")
+        now = time.time()
+        self.touched.extend((now, self._key(h)) for h in found)
+        return found
+
+    def put(self, content_hash, extraction):
+        # Serialised now, so later changes to the record do not leak into the cache.
+        data = zlib.compress(json.dumps(extraction).encode("utf-8"))
+        self.pending.append((self._key(content_hash), data, len(data), time.time()))
+        if len(self.pending) >= 500:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, data, size, last_used) VALUES (?, ?, ?, ?)", self.pending
+            )
+            self.pending = []
+        if self.touched:
+            self.connection.executemany("UPDATE entries SET last_used = ? WHERE key = ?", self.touched)
+            self.touched = []
+        self.connection.commit()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``; returns the count."""
+        total = self.connection.execute("SELECT coalesce(sum(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self.connection.commit()
+        return evicted
+
+    def close(self):
+        self.flush()
+        try:
+            evicted = self.evict()
+        except sqlite3.OperationalError as e:
+            self.connection.rollback()
+            logger.warning("AST cache eviction skipped, %s is busy: %s", self.path, e)
+            evicted = 0
+        self.connection.close()
+        return evicted
@@ -1,18 +1,46 @@
 import ast
+import re
+import sys
+import hashlib
 import json
-import pandas as pd
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow.parquet as pq
 import yaml
+from .record_stream import END_OF_STREAM, is_ndjson
+from .call_resolver import resolve_calls, ModuleIndex, module_name_for_path
+from .ast_cache import ASTCache
+
+_LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+# Bump whenever the extracted Python fields change, so cached extractions
+# from older parsers are ignored.
+PARSER_VERSION = f"4-py{sys.version_info[0]}.{sys.version_info[1]}"
 
 class CodeEntityExtractor(ast.NodeVisitor):
-    def __init__(self, file_name=None, code_lines=None):
+    def __init__(self, file_name=None, code_lines=None, source=None):
         self.file_name = file_name
         self.code_lines = code_lines
+        # Lines split the way the tokenizer counts them, so node offsets line up.
+        self.source_lines = _LINE_BREAK.split(source) if source is not None else None
         self.classes = []
         self.functions = []
         self.calls = []
+        self.import_bindings = {}
         self.current_class = None
         self.current_function = None
 
+    def get_source(self, node):
+        """Source text of an expression node.
+
+        Single-line nodes are sliced straight out of the original line (AST
+        column offsets are UTF-8 byte offsets); anything else is unparsed.
+        """
+        if self.source_lines is not None and getattr(node, 'end_lineno', None) == node.lineno:
+            line = self.source_lines[node.lineno - 1].encode('utf-8')
+            return line[node.col_offset:node.end_col_offset].decode('utf-8')
+        return ast.unparse(node)
+
     def get_signature(self, node):
         args = []
         defaults = []
@@ -21,7 +49,7 @@ class CodeEntityExtractor(ast.NodeVisitor):
                 args.append(arg.arg)
             if hasattr(node.args, 'defaults'):
                 for default in node.args.defaults:
-                    defaults.append(ast.unparse(default) if hasattr(ast, 'unparse') else None)
+                    defaults.append(self.get_source(default) if hasattr(ast, 'unparse') else None)
         return {
             'args': args,
             'defaults': defaults
@@ -32,7 +60,7 @@ class CodeEntityExtractor(ast.NodeVisitor):
         if hasattr(node, 'decorator_list'):
             for dec in node.decorator_list:
                 if hasattr(ast, 'unparse'):
-                    decorators.append(ast.unparse(dec))
+                    decorators.append(self.get_source(dec))
                 else:
                     if isinstance(dec, ast.Name):
                         decorators.append(dec.id)
@@ -45,7 +73,7 @@ class CodeEntityExtractor(ast.NodeVisitor):
         if hasattr(node, 'bases'):
             for base in node.bases:
                 if hasattr(ast, 'unparse'):
-                    bases.append(ast.unparse(base))
+                    bases.append(self.get_source(base))
                 else:
                     if isinstance(base, ast.Name):
                         bases.append(base.id)
@@ -58,9 +86,12 @@ class CodeEntityExtractor(ast.NodeVisitor):
             'name': node.name,
             'methods': [],
             'decorators': self.get_decorators(node),
-            'inheritances': self.get_inheritances(node)
+            'inheritances': self.get_inheritances(node),
+            'lineno': getattr(node, 'lineno', None),
+            'end_lineno': getattr(node, 'end_lineno', None)
         }
         self.classes.append(class_info)
+        previous_class = self.current_class
         self.current_class = node.name
         for n in node.body:
             if isinstance(n, ast.FunctionDef):
@@ -69,9 +100,10 @@ class CodeEntityExtractor(ast.NodeVisitor):
                     method_content = '\n'.join(self.code_lines[n.lineno-1:n.end_lineno])
                 signature = self.get_signature(n)
                 decorators = self.get_decorators(n)
-                class_info['methods'].append({'name': n.name, 'content': method_content, 'signature': signature, 'decorators': decorators})
+                class_info['methods'].append({'name': n.name, 'content': method_content, 'signature': signature, 'decorators': decorators,
+                                              'lineno': n.lineno, 'end_lineno': getattr(n, 'end_lineno', None)})
         self.generic_visit(node)
-        self.current_class = None
+        self.current_class = previous_class
 
     def visit_FunctionDef(self, node):
         if self.current_class:
@@ -82,142 +114,487 @@ class CodeEntityExtractor(ast.NodeVisitor):
                 func_content = '\n'.join(self.code_lines[node.lineno-1:node.end_lineno])
             signature = self.get_signature(node)
             decorators = self.get_decorators(node)
-            self.functions.append({'name': node.name, 'content': func_content, 'signature': signature, 'decorators': decorators})
+            self.functions.append({'name': node.name, 'content': func_content, 'signature': signature, 'decorators': decorators,
+                                   'lineno': node.lineno, 'end_lineno': getattr(node, 'end_lineno', None)})
+        previous_function = self.current_function
         self.current_function = node.name
         self.generic_visit(node)
-        self.current_function = None
+        self.current_function = previous_function
 
     def visit_Call(self, node):
         called_func = None
+        receiver = None
         if isinstance(node.func, ast.Name):
             called_func = node.func.id
         elif isinstance(node.func, ast.Attribute):
             called_func = node.func.attr
+            # Keep simple receivers (self, cls, module aliases) for call resolution.
+            if isinstance(node.func.value, ast.Name):
+                receiver = node.func.value.id
+            else:
+                receiver = ''
         if called_func and self.current_function:
             self.calls.append({
                 'caller_function': self.current_function,
                 'caller_class': self.current_class,
-                'called_function': called_func
+                'called_function': called_func,
+                'receiver': receiver
             })
         self.generic_visit(node)
 
-    def get_imports(self, tree, project_modules=None):
-        import sys
+    def get_imports(self, tree):
+        """Import statements as ``{'module', 'level', 'names'}`` entries, unresolved."""
         imports = []
         for node in ast.walk(tree):
             if isinstance(node, ast.Import):
                 for alias in node.names:
-                    imports.append(alias.name)
+                    imports.append({'module': alias.name, 'level': 0, 'names': []})
+                    if alias.asname:
+                        self.import_bindings[alias.asname] = {'module': alias.name, 'name': None, 'level': 0}
+                    else:
+                        top_level = alias.name.split('.')[0]
+                        self.import_bindings[top_level] = {'module': top_level, 'name': None, 'level': 0}
             elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    imports.append(node.module)
-        result = []
-        builtin_modules = set(sys.builtin_module_names)
-        project_modules = set(project_modules or [])
-        for imp in imports:
-            if imp in builtin_modules:
-                result.append({'module': imp, 'type': 'external_builtin'})
-            elif imp in project_modules:
-                result.append({'module': imp, 'type': 'internal'})
-            else:
-                result.append({'module': imp, 'type': 'external'})
-        return result
-
-def parse_parquet_to_json(parquet_path, output_path, cross_calls=False):
-    df = pd.read_parquet(parquet_path)
-    all_results = []
-    function_index = {} if cross_calls else None
-    method_index = {} if cross_calls else None
-
-    project_modules = set(df[0].apply(lambda x: str(x).replace('.py', '').replace('/', '.').split('.')[-1]) if 0 in df.columns else [])
-    for _, row in df.iterrows():
-        file_path = row[0] if 0 in row else row.get('name', None)
-        code_content = row[1] if 1 in row else row.get('content', None)
-        if file_path is None or code_content is None:
+                imports.append({
+                    'module': node.module, 'level': node.level,
+                    'names': [alias.name for alias in node.names if alias.name != '*'],
+                })
+                for alias in node.names:
+                    if alias.name != '*':
+                        self.import_bindings[alias.asname or alias.name] = {
+                            'module': node.module, 'name': alias.name, 'level': node.level
+                        }
+        return imports
+
+# Modules that ship with the interpreter are not libraries the project depends on.
+_STDLIB_MODULES = set(getattr(sys, 'stdlib_module_names', ())) | set(sys.builtin_module_names)
+
+def classify_imports(file_path, imports, module_index=None):
+    """Resolve the import statements of ``file_path`` against the repository's modules.
+
+    Returns one entry per imported module: ``internal`` entries carry the
+    repository ``file`` they resolve to (``None`` for a relative import of a
+    file that is not in the repository); the rest are ``external_builtin``
+    (standard library) or ``external``.
+    """
+    result = []
+    seen = set()
+
+    def add(entry):
+        key = (entry['type'], entry.get('file') or entry['module'])
+        if key not in seen:
+            seen.add(key)
+            result.append(entry)
+
+    for imp in imports:
+        module, level = imp.get('module'), imp.get('level', 0)
+        targets = []
+        if module_index is not None:
+            # ``from pkg import sub`` imports the submodule when there is one.
+            for name in imp.get('names', []):
+                target = module_index.resolve_import(file_path, f"{module}.{name}" if module else name, level)
+                if target:
+                    targets.append(target)
+            # Any other name (or a plain ``import``) comes from the module itself.
+            if not targets or len(targets) < len(imp.get('names', [])):
+                target = module_index.resolve_import(file_path, module, level)
+                if target:
+                    targets.append(target)
+        if targets:
+            for target in targets:
+                add({'module': module_name_for_path(target), 'type': 'internal', 'file': target})
+        elif level or module_index is not None and module_index.is_project_module(module):
+            # Relative, or a repository module that cannot be pinned to one file.
+            add({'module': '.' * level + (module or ''), 'type': 'internal', 'file': None})
+        elif module.split('.')[0] in _STDLIB_MODULES:
+            add({'module': module, 'type': 'external_builtin'})
+        else:
+            add({'module': module, 'type': 'external'})
+    return result
+
+def content_hash(content):
+    """SHA-256 of a file's raw content, used to detect changed files between builds."""
+    return hashlib.sha256(str(content).encode('utf-8')).hexdigest()
+
+def input_hash(parquet_path):
+    """SHA-256 of a parquet file and ``PARSER_VERSION``: the same value means the same parser records."""
+    digest = hashlib.sha256(PARSER_VERSION.encode('utf-8'))
+    with open(parquet_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _process_file(file_path, code_content):
+    """Extract the record for a single file; returns None for skipped or unparsable files.
+
+    Python records carry their imports unresolved; ``classify_imports``
+    resolves them in the parent, which knows every repository module.
+    """
+    # Handle Python files
+    if str(file_path).endswith('.py'):
+        try:
+            tree = ast.parse(code_content)
+            extractor = CodeEntityExtractor(file_name=str(file_path), code_lines=code_content.splitlines(), source=code_content)
+            extractor.visit(tree)
+            imports = extractor.get_imports(tree)
+            return {
+                'file': str(file_path),
+                'type': 'python',
+                'content_hash': content_hash(code_content),
+                'line_count': len(code_content.splitlines()),
+                'imports': imports,
+                'classes': extractor.classes,
+                'functions': extractor.functions,
+                'calls': extractor.calls,
+                'import_bindings': extractor.import_bindings
+            }
+        except Exception as e:
+            print(f"Error parsing {file_path}: {e}")
+
+    # Handle Markdown files
+    elif str(file_path).endswith('.md'):
+        return {
+            'file': str(file_path),
+            'type': 'markdown',
+            'content_hash': content_hash(code_content),
+            'line_count': len(code_content.splitlines()),
+            'content': code_content
+        }
+
+    # Handle Text files
+    elif str(file_path).endswith('.txt'):
+        return {
+            'file': str(file_path),
+            'type': 'text',
+            'content_hash': content_hash(code_content),
+            'line_count': len(code_content.splitlines()),
+            'content': code_content
+        }
+
+    # Handle YAML files
+    elif str(file_path).endswith(('.yaml', '.yml')):
+        try:
+            yaml_content = yaml.safe_load(code_content)
+            return {
+                'file': str(file_path),
+                'type': 'yaml',
+                'content_hash': content_hash(code_content),
+                'line_count': len(code_content.splitlines()),
+                'content': yaml_content
+            }
+        except Exception as e:
+            print(f"Error processing YAML file {file_path}: {e}")
+    return None
+
+def _resolve_cross_calls(all_results):
+    """Reduce step: build the repo-wide function/method indexes and annotate every call,
+    including the resolved caller/callee keys."""
+    function_index = {}
+    method_index = {}
+    for result in all_results:
+        if result['type'] != 'python':
             continue
+        for func in result['functions']:
+            function_index.setdefault(func['name'], []).append(result['file'])
+        for cls in result['classes']:
+            for method in cls['methods']:
+                method_index.setdefault((cls['name'], method['name']), []).append(result['file'])
+        result['methods'] = [m for cls in result['classes'] for m in cls['methods']]
+
+    for result in all_results:
+        if result['type'] == 'python':
+            for call in result['calls']:
+                called_func = call['called_function']
+                caller_class = call['caller_class']
+                caller_file = result['file']
+                called_files = function_index.get(called_func, [])
+                called_method_files = []
+                if caller_class:
+                    called_method_files = method_index.get((caller_class, called_func), [])
+                call['called_function_files'] = called_files
+                call['called_method_files'] = called_method_files
+                call['self_call_function'] = caller_file in called_files
+                call['self_call_method'] = caller_file in called_method_files
+
+    resolved, unresolved = resolve_calls(all_results)
+    print(f"Resolved {resolved} calls to a single target, {unresolved} left unresolved")
+    return resolved, unresolved
+
+def _call_index_entry(result):
+    """The parts of a Python record the cross-call reduce step needs, without bodies."""
+    return {
+        'file': result['file'],
+        'type': 'python',
+        'functions': [{'name': func['name']} for func in result['functions']],
+        'classes': [
+            {
+                'name': cls['name'],
+                'methods': [{'name': m['name']} for m in cls['methods']],
+                'inheritances': cls.get('inheritances', [])
+            }
+            for cls in result['classes']
+        ],
+        'import_bindings': result.get('import_bindings', {}),
+        'calls': result.pop('calls'),
+    }
 
-        # Skip README files
-        if str(file_path).lower().startswith('readme'):
+# Path/content column pairs, in order of preference: pandas frames saved with
+# integer column labels, or named columns.
+_SOURCE_COLUMNS = [("0", "1"), ("name", "content")]
+
+# Structure columns written by the transforming pipeline, which extracts Python
+# files before its ``python_to_text`` step replaces their source with prose
+# (microservices/transforming_pipeline/.../structure_extractor.py). Rows that
+# carry them, at this version, are taken as extracted and never parsed here;
+# tests/check_shared_code.py checks that both extractors still agree.
+STRUCTURE_VERSION = 1
+_STRUCTURE_COLUMNS = [
+    "ast_version", "ast_source_hash", "ast_line_count", "ast_imports",
+    "ast_classes", "ast_functions", "ast_calls", "ast_import_bindings",
+]
+
+def _source_columns(parquet_file):
+    """Path and content columns, followed by the structure columns when the parquet has them all."""
+    names = set(parquet_file.schema_arrow.names)
+    for columns in _SOURCE_COLUMNS:
+        if set(columns) <= names:
+            return list(columns) + (_STRUCTURE_COLUMNS if set(_STRUCTURE_COLUMNS) <= names else [])
+    raise ValueError(f"{parquet_file} has none of the expected path/content columns {_SOURCE_COLUMNS}")
+
+def _iter_source_batches(parquet_file, columns, batch_size, stats):
+    """Yield ``(paths, contents, structures)`` per record batch, reading only the projected columns.
+
+    ``structures`` holds the structure column values of each row, or None
+    for rows the pipeline did not extract.
+    """
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        paths = []
+        contents = []
+        structures = []
+        if batch.num_columns > 2:
+            rows = batch.select(_STRUCTURE_COLUMNS).to_pylist()
+            row_structures = [row if row['ast_version'] == STRUCTURE_VERSION else None for row in rows]
+        else:
+            row_structures = [None] * batch.num_rows
+        for file_path, code_content, structure in zip(batch.column(0).to_pylist(), batch.column(1).to_pylist(),
+                                                      row_structures):
+            if file_path is None or code_content is None and structure is None:
+                continue
+
+            # Skip README files
+            if str(file_path).lower().startswith('readme'):
+                continue
+            paths.append(file_path)
+            contents.append(code_content)
+            structures.append(structure)
+        stats['files'] += len(paths)
+        yield paths, contents, structures
+
+def _extraction(record):
+    """The cacheable, project-independent part of a Python record."""
+    return {
+        'imports': record['imports'],
+        'classes': record['classes'],
+        'functions': record['functions'],
+        'calls': record['calls'],
+        'import_bindings': record['import_bindings'],
+    }
+
+def _structure_extraction(structure):
+    """The ``_extraction`` of a file from its structure columns."""
+    def callable_entry(entry):
+        return {
+            'name': entry['name'], 'content': entry['content'],
+            'signature': {'args': entry['args'] or [], 'defaults': entry['defaults'] or []},
+            'decorators': entry['decorators'] or [], 'lineno': entry['lineno'], 'end_lineno': entry['end_lineno'],
+        }
+
+    return {
+        'imports': [
+            {'module': imp['module'], 'level': imp['level'], 'names': imp['names'] or []}
+            for imp in structure['ast_imports'] or []
+        ],
+        'classes': [
+            {
+                'name': cls['name'],
+                'methods': [callable_entry(method) for method in cls['methods'] or []],
+                'decorators': cls['decorators'] or [],
+                'inheritances': cls['inheritances'] or [],
+                'lineno': cls['lineno'],
+                'end_lineno': cls['end_lineno'],
+            }
+            for cls in structure['ast_classes'] or []
+        ],
+        'functions': [callable_entry(func) for func in structure['ast_functions'] or []],
+        'calls': [dict(call) for call in structure['ast_calls'] or []],
+        'import_bindings': {
+            binding['alias']: {'module': binding['module'], 'name': binding['name'], 'level': binding['level']}
+            for binding in structure['ast_import_bindings'] or []
+        },
+    }
+
+def _record_from_extraction(file_path, line_count, file_hash, extraction, module_index):
+    return {
+        'file': str(file_path),
+        'type': 'python',
+        'content_hash': file_hash,
+        'line_count': line_count,
+        'imports': classify_imports(str(file_path), extraction['imports'], module_index),
+        'classes': extraction['classes'],
+        'functions': extraction['functions'],
+        'calls': extraction['calls'],
+        'import_bindings': extraction['import_bindings'],
+    }
+
+def _submit_batch(paths, contents, structures, module_index, executor, workers, cache, stats):
+    """Start extracting one batch: cache hits are rebuilt here, misses go to the pool.
+
+    Files with structure columns are neither looked up nor parsed. Pool
+    work is submitted before returning; the returned generator yields the
+    records in input order and stores fresh extractions in the cache.
+    """
+    hashes = [
+        content_hash(content) if str(path).endswith('.py') and structure is None else None
+        for path, content, structure in zip(paths, contents, structures)
+    ]
+    cached = {}
+    if cache is not None:
+        cached = cache.get_many(h for h in hashes if h)
+        hits = sum(1 for h in hashes if h in cached)
+        stats['cache_hits'] += hits
+        stats['cache_misses'] += sum(1 for h in hashes if h) - hits
+    misses = [i for i, h in enumerate(hashes) if h not in cached and structures[i] is None]
+    if executor is not None:
+        chunksize = max(1, len(misses) // (workers * 4))
+        miss_results = executor.map(_process_file, [paths[i] for i in misses], [contents[i] for i in misses],
+                                    chunksize=chunksize)
+    else:
+        miss_results = (_process_file(paths[i], contents[i]) for i in misses)
+    return _merge_batch(paths, contents, structures, hashes, cached, miss_results, module_index, cache, stats)
+
+def _merge_batch(paths, contents, structures, hashes, cached, miss_results, module_index, cache, stats):
+    miss_results = iter(miss_results)
+    for path, content, structure, file_hash in zip(paths, contents, structures, hashes):
+        if structure is not None:
+            stats['structured'] = stats.get('structured', 0) + 1
+            yield _record_from_extraction(path, structure['ast_line_count'], structure['ast_source_hash'],
+                                          _structure_extraction(structure), module_index)
             continue
+        if file_hash in cached:
+            yield _record_from_extraction(path, len(content.splitlines()), file_hash,
+                                          json.loads(cached[file_hash]), module_index)
+            continue
+        result = next(miss_results)
+        if result is not None and result['type'] == 'python':
+            if cache is not None:
+                cache.put(file_hash, _extraction(result))
+            result['imports'] = classify_imports(result['file'], result['imports'], module_index)
+        yield result
+
+def _extract_batches(batches, module_index, executor, workers, cache, stats):
+    """Extract every batch, keeping one batch queued ahead of the one being consumed."""
+    pending = None
+    for paths, contents, structures in batches:
+        submitted = _submit_batch(paths, contents, structures, module_index, executor, workers, cache, stats)
+        if pending is not None:
+            yield from pending
+        pending = submitted
+    if pending is not None:
+        yield from pending
+
+def parse_parquet_to_json(parquet_path, output_path, cross_calls=False, workers=1, batch_size=1024,
+                          cache_path=None, cache_max_bytes=512 * 1024 * 1024):
+    """Extract code entities from the processed parquet and write them as JSON.
+
+    The parquet is read with pyarrow in record batches of ``batch_size``
+    rows, projecting only the path, content and structure columns, so memory
+    is bounded by the batch rather than the repository. With ``workers > 1`` each batch
+    is sharded across a process pool; results come back in input order, so
+    the output is identical to a serial run.
+
+    If ``output_path`` ends in ``.ndjson``/``.jsonl`` each record is written
+    as one line as soon as it is extracted. With ``cross_calls`` the calls
+    of every Python file are then moved into trailing ``{"type": "calls"}``
+    records, written once the repo-wide indexes are known, and the stream
+    ends with a ``{"type": "stats"}`` record and an end-of-stream marker.
+
+    With ``cache_path`` Python extractions are kept in an ``ASTCache``
+    keyed by content hash and ``PARSER_VERSION``, so only new or changed
+    files are parsed. Imports are resolved per run against a ``ModuleIndex``
+    of every Python path in the parquet (read in a path-only pass first),
+    because the result depends on the whole repository.
+
+    Python files the transforming pipeline already extracted (structure
+    columns at ``STRUCTURE_VERSION``) are built from those columns instead,
+    since their content may be an explanation rather than source; the
+    ``structured`` statistic counts them.
 
-        # Handle Python files
-        if str(file_path).endswith('.py'):
-            try:
-                tree = ast.parse(code_content)
-                extractor = CodeEntityExtractor(file_name=str(file_path), code_lines=code_content.splitlines())
-                extractor.visit(tree)
-                imports = extractor.get_imports(tree, project_modules=project_modules)
-                result = {
-                    'file': str(file_path),
-                    'type': 'python',
-                    'imports': imports,
-                    'classes': extractor.classes,
-                    'functions': extractor.functions,
-                    'calls': extractor.calls
-                }
-                if cross_calls:
-                    for func in extractor.functions:
-                        function_index.setdefault(func['name'], []).append(str(file_path))
-                    for cls in extractor.classes:
-                        for method in cls['methods']:
-                            method_index.setdefault((cls['name'], method['name']), []).append(str(file_path))
-                    result['methods'] = [m for cls in extractor.classes for m in cls['methods']]
-                all_results.append(result)
-            except Exception as e:
-                print(f"Error parsing {file_path}: {e}")
-
-        # Handle Markdown files
-        elif str(file_path).endswith('.md'):
-            try:
-                result = {
-                    'file': str(file_path),
-                    'type': 'markdown',
-                    'content': code_content
-                }
-                all_results.append(result)
-            except Exception as e:
-                print(f"Error processing Markdown file {file_path}: {e}")
-
-        # Handle Text files
-        elif str(file_path).endswith('.txt'):
-            try:
-                result = {
-                    'file': str(file_path),
-                    'type': 'text',
-                    'content': code_content
-                }
-                all_results.append(result)
-            except Exception as e:
-                print(f"Error processing Text file {file_path}: {e}")
-
-        # Handle YAML files
-        elif str(file_path).endswith(('.yaml', '.yml')):
-            try:
-                yaml_content = yaml.safe_load(code_content)
-                result = {
-                    'file': str(file_path),
-                    'type': 'yaml',
-                    'content': yaml_content
-                }
-                all_results.append(result)
-            except Exception as e:
-                print(f"Error processing YAML file {file_path}: {e}")
-
-    if cross_calls:
-        for result in all_results:
-            if result['type'] == 'python':
-                for call in result['calls']:
-                    called_func = call['called_function']
-                    caller_class = call['caller_class']
-                    caller_file = result['file']
-                    called_files = function_index.get(called_func, [])
-                    called_method_files = []
-                    if caller_class:
-                        called_method_files = method_index.get((caller_class, called_func), [])
-                    call['called_function_files'] = called_files
-                    call['called_method_files'] = called_method_files
-                    call['self_call_function'] = caller_file in called_files
-                    call['self_call_method'] = caller_file in called_method_files
+    Returns the parse statistics (files, records per type, skipped files,
+    cache hits, resolved calls and seconds) that also go into the build report.
+    """
+    start = time.perf_counter()
+    parquet_file = pq.ParquetFile(parquet_path)
+    columns = _source_columns(parquet_file)
 
+    # Needs every path up front; reads the path column alone.
+    module_index = ModuleIndex(
+        str(path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns[:1])
+        for path in batch.column(0).to_pylist()
+        if path is not None and str(path).endswith('.py')
+    )
+
+    stats = {'files': 0, 'records': {}, 'skipped': 0, 'workers': workers or 1}
+    batches = _iter_source_batches(parquet_file, columns, batch_size, stats)
+    cache = ASTCache(cache_path, PARSER_VERSION, max_bytes=cache_max_bytes) if cache_path else None
+    if cache is not None:
+        stats['cache_hits'] = stats['cache_misses'] = 0
+    executor = None
+    if workers and workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    results = _extract_batches(batches, module_index, executor, workers, cache, stats)
+
+    results = _counted(results, stats)
+    try:
+        if is_ndjson(output_path):
+            _write_ndjson(results, output_path, cross_calls, stats, start)
+        else:
+            all_results = list(results)
+            if cross_calls:
+                stats['resolved_calls'], stats['unresolved_calls'] = _resolve_cross_calls(all_results)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(all_results, f, indent=2)
+            stats['seconds'] = time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            stats['cache_evicted'] = cache.close()
+    return stats
+
+def _counted(results, stats):
+    """Drop skipped files from ``results`` while counting records per type."""
+    for result in results:
+        if result is None:
+            stats['skipped'] += 1
+            continue
+        stats['records'][result['type']] = stats['records'].get(result['type'], 0) + 1
+        yield result
+
+def _write_ndjson(results, output_path, cross_calls, stats, start):
+    call_index = []
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_results, f, indent=2)
+        for result in results:
+            if cross_calls and result['type'] == 'python':
+                result['methods'] = [m for cls in result['classes'] for m in cls['methods']]
+                call_index.append(_call_index_entry(result))
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+
+        if cross_calls:
+            stats['resolved_calls'], stats['unresolved_calls'] = _resolve_cross_calls(call_index)
+            for entry in call_index:
+                f.write(json.dumps({'file': entry['file'], 'type': 'calls', 'calls': entry['calls']}) + '\n')
+        stats['seconds'] = time.perf_counter() - start
+        f.write(json.dumps({'type': 'stats', **stats}) + '\n')
+        f.write(json.dumps(END_OF_STREAM) + '\n')
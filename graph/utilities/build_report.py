@@ -0,0 +1,110 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Report phases and the loader phases they are made of.
+REPORT_PHASES = {
+    "folder_tree": ["folders", "files", "folder_contains_folder", "folder_contains_file"],
+    "chunks": ["chunk_contents", "chunks", "file_contains_chunk", "chunk_has_content", "chunk_follows"],
+    "classes_methods": [
+        "classes", "methods", "functions",
+        "file_defines_class", "class_defines_method", "file_defines_function",
+    ],
+    "calls": ["calls_method_method", "calls_method_function", "calls_function_function", "calls_function_method"],
+    "imports": ["file_uses_library", "file_imports_file"],
+    "file_hashes": ["file_hashes"],
+}
+
+# Counters summed from Neo4j result summaries.
+QUERY_COUNTERS = [
+    "nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+    "properties_set", "labels_added", "db_hits",
+]
+
+
+def summary_counters(summary):
+    """Query counters of a neo4j ``ResultSummary``, plus db hits when it was PROFILEd."""
+    counters = summary.counters
+    values = {name: getattr(counters, name, 0) for name in QUERY_COUNTERS if name != "db_hits"}
+    values["db_hits"] = _profile_db_hits(summary.profile) if summary.profile else 0
+    return values
+
+
+def _profile_db_hits(plan):
+    if not plan:
+        return 0
+    return (plan.get("dbHits") or 0) + sum(_profile_db_hits(child) for child in plan.get("children") or [])
+
+
+class BuildReport:
+    """Timings and counters for one graph build, written out as JSON.
+
+    Steps (parse, schema, collect, load, ...) are timed with ``step``; loader
+    statistics are folded into the ``REPORT_PHASES`` groups so that builds
+    of different releases can be compared phase by phase.
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.steps = {}
+        self.counters = {}
+        self.sections = {}
+        self.loader_stats = {}
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_section(self, name, values):
+        self.sections[name] = values
+
+    def add_loader_stats(self, stats):
+        for phase, stat in stats.items():
+            merged = self.loader_stats.setdefault(phase, {})
+            for key, value in stat.items():
+                merged[key] = merged.get(key, 0) + value
+
+    def phases(self):
+        """Loader statistics summed per report phase."""
+        result = {}
+        for name, loader_phases in REPORT_PHASES.items():
+            totals = {}
+            for phase in loader_phases:
+                for key, value in self.loader_stats.get(phase, {}).items():
+                    totals[key] = totals.get(key, 0) + value
+            if totals:
+                if totals.get("seconds"):
+                    totals["rows_per_second"] = totals.get("rows", 0) / totals["seconds"]
+                result[name] = totals
+        return result
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at.isoformat(),
+            "total_seconds": time.perf_counter() - self._start,
+            "settings": self.settings,
+            "steps": self.steps,
+            "counters": self.counters,
+            "phases": self.phases(),
+            "loader_phases": self.loader_stats,
+            **self.sections,
+        }
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        print(f"Build report written to {path}")
@@ -0,0 +1,422 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from neo4j.exceptions import TransientError
+from .build_report import summary_counters
+
+# Node phases are always written before any relationship phase that may
+# reference them; call and import edges, which may point at files later in
+# the stream, and file hashes are deferred until every node exists.
+NODE_PHASES = [
+    "folders",
+    "files",
+    "chunk_contents",
+    "chunks",
+    "classes",
+    "methods",
+    "functions",
+]
+
+EDGE_PHASES = [
+    "folder_contains_folder",
+    "folder_contains_file",
+    "file_contains_chunk",
+    "chunk_has_content",
+    "chunk_follows",
+    "file_defines_class",
+    "class_defines_method",
+    "file_defines_function",
+    "file_uses_library",
+]
+
+DEFERRED_PHASES = [
+    "calls_method_method",
+    "calls_method_function",
+    "calls_function_function",
+    "calls_function_method",
+    "file_imports_file",
+    "file_hashes",
+]
+
+# Groups separated by a barrier when batches run concurrently: every batch of
+# one group has committed before any batch of the next group starts.
+PHASE_GROUPS = [
+    NODE_PHASES,
+    EDGE_PHASES,
+    [phase for phase in DEFERRED_PHASES if phase != "file_hashes"],
+    ["file_hashes"],
+]
+
+# Start-node column of each relationship phase. Concurrent batches are cut
+# from rows sorted on it, so all edges of one node land in the same batch and
+# parallel transactions rarely lock the same node.
+PARTITION_KEYS = {
+    "folder_contains_folder": "parent",
+    "folder_contains_file": "folder",
+    "file_contains_chunk": "file",
+    "chunk_has_content": "chunk_id",
+    "chunk_follows": "prev_id",
+    "file_defines_class": "file",
+    "class_defines_method": "class_key",
+    "file_defines_function": "file",
+    "file_uses_library": "file",
+    "calls_method_method": "caller_key",
+    "calls_method_function": "caller_key",
+    "calls_function_function": "caller_key",
+    "calls_function_method": "caller_key",
+    "file_imports_file": "file",
+}
+
+# Every statement runs with ``$repo``: nodes are MERGEd and MATCHed on their
+# composite (repo, key) identity and relationships carry the same key.
+PHASE_QUERIES = {
+    "folders": (
+        "UNWIND $rows AS row "
+        "MERGE (:Folder {repo: $repo, path: row.path})"
+    ),
+    "files": (
+        "UNWIND $rows AS row "
+        "MERGE (f:File {repo: $repo, path: row.path}) "
+        "SET f.line_count = row.line_count "
+        "FOREACH (_ IN CASE WHEN row.type = 'markdown' THEN [1] ELSE [] END | SET f:Markdown) "
+        "FOREACH (_ IN CASE WHEN row.type = 'text' THEN [1] ELSE [] END | SET f:TextFile) "
+        "FOREACH (_ IN CASE WHEN row.type = 'yaml' THEN [1] ELSE [] END | SET f:YAML)"
+    ),
+    # Text shared by several chunks is one node; the row of its first occurrence sets it.
+    "chunk_contents": (
+        "UNWIND $rows AS row "
+        "MERGE (t:ChunkContent {repo: $repo, hash: row.hash}) "
+        "SET t.content = row.content, t.char_count = row.char_count, t.word_count = row.word_count, "
+        "t.token_count = row.token_count, t.body_hash = row.body_hash, t.body_length = row.body_length"
+    ),
+    "chunks": (
+        "UNWIND $rows AS row "
+        "MERGE (c:Chunk {repo: $repo, id: row.id}) SET c = row, c.repo = $repo"
+    ),
+    "classes": (
+        "UNWIND $rows AS row "
+        "MERGE (c:Class {repo: $repo, key: row.key}) "
+        "SET c.name = row.name, c.file = row.file, c.decorators = row.decorators, "
+        "c.inheritances = row.inheritances, c.lineno = row.lineno, c.end_lineno = row.end_lineno"
+    ),
+    "methods": (
+        "UNWIND $rows AS row "
+        "MERGE (m:Method {repo: $repo, key: row.key}) "
+        "SET m.name = row.name, m.class = row.class, m.file = row.file, m.content = row.content, "
+        "m.body_hash = row.body_hash, m.body_length = row.body_length, "
+        "m.signature = row.signature, m.decorators = row.decorators, "
+        "m.lineno = row.lineno, m.end_lineno = row.end_lineno"
+    ),
+    "functions": (
+        "UNWIND $rows AS row "
+        "MERGE (fn:Function {repo: $repo, key: row.key}) "
+        "SET fn.name = row.name, fn.file = row.file, fn.content = row.content, "
+        "fn.body_hash = row.body_hash, fn.body_length = row.body_length, "
+        "fn.signature = row.signature, fn.decorators = row.decorators, "
+        "fn.lineno = row.lineno, fn.end_lineno = row.end_lineno"
+    ),
+    "folder_contains_folder": (
+        "UNWIND $rows AS row "
+        "MATCH (p:Folder {repo: $repo, path: row.parent}), (c:Folder {repo: $repo, path: row.child}) "
+        "MERGE (p)-[:CONTAINS {repo: $repo}]->(c)"
+    ),
+    "folder_contains_file": (
+        "UNWIND $rows AS row "
+        "MATCH (d:Folder {repo: $repo, path: row.folder}), (f:File {repo: $repo, path: row.file}) "
+        "MERGE (d)-[:CONTAINS {repo: $repo}]->(f)"
+    ),
+    "file_contains_chunk": (
+        "UNWIND $rows AS row "
+        "MATCH (f:File {repo: $repo, path: row.file}) "
+        "MATCH (c:Chunk {repo: $repo, id: row.chunk_id}) "
+        "MERGE (f)-[:CONTAINS {repo: $repo}]->(c)"
+    ),
+    "chunk_has_content": (
+        "UNWIND $rows AS row "
+        "MATCH (c:Chunk {repo: $repo, id: row.chunk_id}) "
+        "MATCH (t:ChunkContent {repo: $repo, hash: row.hash}) "
+        "MERGE (c)-[:HAS_CONTENT {repo: $repo}]->(t)"
+    ),
+    "chunk_follows": (
+        "UNWIND $rows AS row "
+        "MATCH (prev:Chunk {repo: $repo, id: row.prev_id}) "
+        "MATCH (curr:Chunk {repo: $repo, id: row.curr_id}) "
+        "MERGE (prev)-[:FOLLOWS {repo: $repo}]->(curr)"
+    ),
+    "file_defines_class": (
+        "UNWIND $rows AS row "
+        "MATCH (f:File {repo: $repo, path: row.file}), (c:Class {repo: $repo, key: row.class_key}) "
+        "MERGE (f)-[:DEFINES {repo: $repo}]->(c)"
+    ),
+    "class_defines_method": (
+        "UNWIND $rows AS row "
+        "MATCH (c:Class {repo: $repo, key: row.class_key}), (m:Method {repo: $repo, key: row.method_key}) "
+        "MERGE (c)-[:DEFINES {repo: $repo}]->(m)"
+    ),
+    "file_defines_function": (
+        "UNWIND $rows AS row "
+        "MATCH (f:File {repo: $repo, path: row.file}), (fn:Function {repo: $repo, key: row.function_key}) "
+        "MERGE (f)-[:DEFINES {repo: $repo}]->(fn)"
+    ),
+    "file_uses_library": (
+        "UNWIND $rows AS row "
+        "MERGE (lib:Library {repo: $repo, name: row.module}) "
+        "WITH lib, row "
+        "MATCH (f:File {repo: $repo, path: row.file}) "
+        "MERGE (f)-[:USES {repo: $repo}]->(lib)"
+    ),
+    "calls_method_method": (
+        "UNWIND $rows AS row "
+        "MATCH (a:Method {repo: $repo, key: row.caller_key}) "
+        "MATCH (b:Method {repo: $repo, key: row.callee_key}) "
+        "MERGE (a)-[r:CALLS {repo: $repo}]->(b) "
+        "SET r.caller_function = row.caller, r.caller_class = row.caller_class, r.called_function = row.called"
+    ),
+    "calls_method_function": (
+        "UNWIND $rows AS row "
+        "MATCH (a:Method {repo: $repo, key: row.caller_key}) "
+        "MATCH (b:Function {repo: $repo, key: row.callee_key}) "
+        "MERGE (a)-[r:CALLS {repo: $repo}]->(b) "
+        "SET r.caller_function = row.caller, r.caller_class = row.caller_class, r.called_function = row.called"
+    ),
+    "calls_function_function": (
+        "UNWIND $rows AS row "
+        "MATCH (a:Function {repo: $repo, key: row.caller_key}) "
+        "MATCH (b:Function {repo: $repo, key: row.callee_key}) "
+        "MERGE (a)-[r:CALLS {repo: $repo}]->(b) "
+        "SET r.caller_function = row.caller, r.called_function = row.called"
+    ),
+    "calls_function_method": (
+        "UNWIND $rows AS row "
+        "MATCH (a:Function {repo: $repo, key: row.caller_key}) "
+        "MATCH (b:Method {repo: $repo, key: row.callee_key}) "
+        "MERGE (a)-[r:CALLS {repo: $repo}]->(b) "
+        "SET r.caller_function = row.caller, r.called_function = row.called"
+    ),
+    "file_imports_file": (
+        "UNWIND $rows AS row "
+        "MATCH (a:File {repo: $repo, path: row.file}) "
+        "MATCH (b:File {repo: $repo, path: row.target}) "
+        "MERGE (a)-[:IMPORTS {repo: $repo}]->(b)"
+    ),
+    # Written last so a file only looks up to date once its whole subgraph is in.
+    "file_hashes": (
+        "UNWIND $rows AS row "
+        "MATCH (f:File {repo: $repo, path: row.path}) "
+        "SET f.content_hash = row.content_hash"
+    ),
+}
+
+
+# Marks one batch of an interrupted build as committed (see ``BulkLoader``).
+CHECKPOINT_QUERY = (
+    "MERGE (c:BuildCheckpoint {repo: $repo, phase: $phase, batch: $batch}) "
+    "SET c.key = $key, c.digest = $digest"
+)
+
+
+def batch_digest(rows):
+    """Fingerprint of a batch's rows, recorded with its checkpoint."""
+    return hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _run_batch(tx, query, rows, repo, checkpoint=None):
+    summary = tx.run(query, rows=rows, repo=repo).consume()
+    if checkpoint is not None:
+        # Same transaction as the batch, so the checkpoint commits exactly when the batch does.
+        tx.run(CHECKPOINT_QUERY, repo=repo, **checkpoint).consume()
+    return summary
+
+
+class BulkLoader:
+    """Buffers graph rows per phase and writes them with parameterised UNWIND batches.
+
+    Each batch is committed in its own explicit (managed) transaction. With
+    ``per_row=True`` the same phase queries are sent one row at a time in
+    auto-commit mode, which reproduces the round-trip profile of the original
+    loader and gives a baseline to compare against.
+
+    With ``workers > 1`` batches are committed concurrently from a thread pool,
+    one session per batch. Ordering needs no locks: a relationship batch is
+    only submitted after every node batch queued before it has committed (see
+    ``PHASE_GROUPS``). Transactions that still fail with a transient error
+    such as a deadlock after the driver's own retries are retried with
+    jittered backoff up to ``max_retries`` times.
+
+    Query counters from each result summary are added to ``stats``; with
+    ``profile=True`` every statement is PROFILEd so db hits are counted too,
+    at the cost of slower writes.
+
+    Every row is written into repository ``repo``.
+
+    Batches are numbered per phase in the order they are cut, which only
+    depends on the input, ``batch_size`` and ``workers``. With a
+    ``checkpoint`` key each committed batch is recorded as a
+    ``BuildCheckpoint`` node in its own transaction together with a digest
+    of its rows, and batches in ``completed`` (``{(phase, batch): digest}``
+    from an interrupted build of the same input) are skipped when their
+    rows are unchanged. A batch cut short by an input that ended early, or
+    cut from a differently sorted buffer, has another digest and is written
+    again. Every phase query MERGEs or SETs, so replaying a batch is
+    harmless.
+    """
+
+    def __init__(self, driver, batch_size=1000, per_row=False, workers=1, max_retries=5, profile=False,
+                 repo="default", checkpoint=None, completed=()):
+        self.driver = driver
+        self.repo = repo
+        self.checkpoint = checkpoint
+        self.completed = dict(completed)
+        self._batch_index = defaultdict(int)
+        self.batch_size = max(1, int(batch_size))
+        self.per_row = per_row
+        self.workers = max(1, int(workers))
+        self.max_retries = max_retries
+        self.profile = profile
+        self.buffers = defaultdict(list)
+        self.stats = {}
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def add(self, phase, row):
+        """Buffer a row for ``phase``, writing the buffer once it is full."""
+        buffer = self.buffers[phase]
+        buffer.append(row)
+        if len(buffer) < self.batch_size or phase in DEFERRED_PHASES:
+            return
+        if phase in EDGE_PHASES:
+            # Relationships may point at nodes still sitting in a buffer.
+            self._flush_phases(NODE_PHASES)
+            self._wait(NODE_PHASES)
+        self._flush_phases([phase])
+
+    def flush(self):
+        """Write every buffered row, node phases first and call edges last."""
+        for group in PHASE_GROUPS:
+            self._flush_phases(group)
+            self._wait()
+        self.finished = time.perf_counter()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _flush_phases(self, phases):
+        for phase in phases:
+            rows = self.buffers.pop(phase, None)
+            if rows:
+                self._write(phase, rows)
+
+    def _write(self, phase, rows):
+        if self.started is None:
+            self.started = time.perf_counter()
+        query = PHASE_QUERIES[phase]
+        if self.profile:
+            query = "PROFILE " + query
+        if self._executor is not None and phase in PARTITION_KEYS:
+            key = PARTITION_KEYS[phase]
+            rows = sorted(rows, key=lambda row: row[key])
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            index = self._batch_index[phase]
+            self._batch_index[phase] += 1
+            digest = None
+            if self.checkpoint is not None:
+                digest = batch_digest(batch)
+                if self.completed.get((phase, index)) == digest:
+                    self._record(phase, skipped=len(batch))
+                    continue
+            if self._executor is None:
+                self._run(phase, query, batch, index, digest)
+            else:
+                future = self._executor.submit(self._run, phase, query, batch, index, digest)
+                self._pending.append((phase, future))
+
+    def _wait(self, phases=None):
+        """Block until the submitted batches of ``phases`` (default: all) have committed."""
+        waiting = [item for item in self._pending if phases is None or item[0] in phases]
+        self._pending = [item for item in self._pending if not (phases is None or item[0] in phases)]
+        for _, future in waiting:
+            future.result()
+
+    def _run(self, phase, query, rows, index, digest):
+        start = time.perf_counter()
+        retries = 0
+        checkpoint = None
+        if self.checkpoint is not None:
+            checkpoint = {"key": self.checkpoint, "phase": phase, "batch": index, "digest": digest}
+        while True:
+            counters = {}
+            try:
+                with self.driver.session() as session:
+                    if self.per_row:
+                        summaries = [session.run(query, rows=[row], repo=self.repo).consume() for row in rows]
+                        if checkpoint is not None:
+                            session.run(CHECKPOINT_QUERY, repo=self.repo, **checkpoint).consume()
+                    else:
+                        summaries = [session.execute_write(_run_batch, query, rows, self.repo, checkpoint)]
+                    for summary in summaries:
+                        for name, value in summary_counters(summary).items():
+                            counters[name] = counters.get(name, 0) + value
+                break
+            except TransientError:
+                if retries >= self.max_retries:
+                    raise
+                retries += 1
+                # MERGE is idempotent, so replaying a partly written batch is safe.
+                time.sleep(random.uniform(0, 0.05 * 2 ** retries))
+        self._record(phase, rows=len(rows), seconds=time.perf_counter() - start, retries=retries, counters=counters)
+
+    def _record(self, phase, rows=0, seconds=0.0, retries=0, counters=None, skipped=0):
+        with self._lock:
+            stat = self.stats.setdefault(phase, {
+                "rows": 0, "batches": 0, "seconds": 0.0, "retries": 0, "skipped_rows": 0, "skipped_batches": 0,
+            })
+            if skipped:
+                stat["skipped_rows"] += skipped
+                stat["skipped_batches"] += 1
+                return
+            stat["rows"] += rows
+            stat["batches"] += 1
+            stat["seconds"] += seconds
+            stat["retries"] += retries
+            for name, value in (counters or {}).items():
+                stat[name] = stat.get(name, 0) + value
+
+    def report(self):
+        """Print rows, batches and rows/sec for every phase that wrote data."""
+        mode = "per-row" if self.per_row else f"batch size {self.batch_size}"
+        if self.workers > 1:
+            mode += f", {self.workers} workers; phase seconds are summed over workers"
+        print(f"Load throughput ({mode}):")
+        total_rows = 0
+        total_seconds = 0.0
+        total_retries = 0
+        total_skipped = 0
+        for phase in NODE_PHASES + EDGE_PHASES + DEFERRED_PHASES:
+            stat = self.stats.get(phase)
+            if not stat:
+                continue
+            total_rows += stat["rows"]
+            total_seconds += stat["seconds"]
+            total_retries += stat["retries"]
+            total_skipped += stat["skipped_batches"]
+            rate = stat["rows"] / stat["seconds"] if stat["seconds"] else 0.0
+            print(f"  {phase:<24} {stat['rows']:>8} rows {stat['batches']:>6} batches "
+                  f"{stat['seconds']:>8.2f}s {rate:>10.0f} rows/s")
+        if self.workers > 1 and self.started is not None and self.finished is not None:
+            # Batches overlap, so the total is wall-clock time.
+            total_seconds = self.finished - self.started
+        rate = total_rows / total_seconds if total_seconds else 0.0
+        print(f"  {'total':<24} {total_rows:>8} rows {'':>14} {total_seconds:>8.2f}s {rate:>10.0f} rows/s")
+        if total_retries:
+            print(f"  Transactions retried after transient errors: {total_retries}")
+        if total_skipped:
+            print(f"  Batches already committed by the interrupted build, skipped: {total_skipped}")
+        return self.stats
@@ -0,0 +1,247 @@
+import builtins
+from collections import defaultdict
+from .keys import method_key, function_key
+
+_BUILTIN_NAMES = set(dir(builtins))
+# Method names of builtin types; ``x.add()`` on an unknown receiver is far more
+# likely to be a set than the one repo class that happens to define ``add``.
+_BUILTIN_METHOD_NAMES = {
+    name
+    for type_ in (str, bytes, list, dict, set, frozenset, tuple, int, float, object)
+    for name in dir(type_)
+}
+
+# How many re-export / base-class hops are followed before giving up.
+_MAX_DEPTH = 3
+
+
+def module_name_for_path(file_path):
+    """Dotted module name of a Python file ('pkg/mod.py' -> 'pkg.mod', 'pkg/__init__.py' -> 'pkg')."""
+    parts = [part for part in str(file_path).replace('\\', '/').split('/') if part]
+    if parts and parts[-1].endswith('.py'):
+        parts[-1] = parts[-1][:-3]
+    if parts and parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+
+class ModuleIndex:
+    """Maps dotted module names to repository files.
+
+    Exact module paths win; otherwise a file is found through any dotted
+    suffix of its module path (so ``typer.main`` finds ``src/typer/main.py``).
+    A suffix shared by several files is resolved for an importing file by
+    the candidates whose import root (the directory the suffix starts
+    below) contains that file, the closest root winning; without an
+    importing file it must be unambiguous.
+    """
+
+    def __init__(self, file_paths):
+        self.exact = {}
+        # suffix -> {path: import root directory}
+        self.by_suffix = defaultdict(dict)
+        for path in file_paths:
+            module = module_name_for_path(path)
+            if not module:
+                continue
+            self.exact[module] = path
+            parts = module.split('.')
+            for i in range(len(parts)):
+                self.by_suffix['.'.join(parts[i:])][path] = '/'.join(parts[:i])
+
+    def resolve(self, module, from_file=None):
+        if not module:
+            return None
+        if module in self.exact:
+            return self.exact[module]
+        files = self.by_suffix.get(module)
+        if not files:
+            return None
+        if len(files) == 1:
+            return next(iter(files))
+        if from_file is None:
+            return None
+        importer = str(from_file).replace('\\', '/')
+        roots = {path: root for path, root in files.items() if not root or importer.startswith(root + '/')}
+        if not roots:
+            return None
+        deepest = max(len(root) for root in roots.values())
+        closest = [path for path, root in roots.items() if len(root) == deepest]
+        return closest[0] if len(closest) == 1 else None
+
+    def is_project_module(self, module):
+        """Whether ``module`` names a repository file, even if it cannot be pinned to one."""
+        return bool(module) and (module in self.exact or module in self.by_suffix)
+
+    def resolve_import(self, file_path, module, level=0):
+        """Resolve an import statement's module as seen from ``file_path``, including relative imports."""
+        if not level:
+            return self.resolve(module, file_path)
+        package = module_name_for_path(file_path).split('.')
+        if not str(file_path).endswith('__init__.py'):
+            package = package[:-1]
+        if level > 1:
+            package = package[:len(package) - (level - 1)] if level - 1 <= len(package) else []
+        target = '.'.join(package + ([module] if module else []))
+        return self.exact.get(target) or self.resolve(target)
+
+
+class SymbolTable:
+    """Repo-wide symbol table used to turn call sites into (caller key -> callee key) pairs.
+
+    Built from the per-file records of the parser (only names, classes,
+    calls and import bindings are needed).
+    """
+
+    def __init__(self, entries):
+        python_entries = [e for e in entries if e.get('type') == 'python']
+        self.modules = ModuleIndex([e['file'] for e in python_entries])
+        self.functions = defaultdict(set)
+        self.classes = defaultdict(dict)
+        self.bindings = {}
+        self.functions_by_name = defaultdict(list)
+        self.methods_by_name = defaultdict(list)
+        for entry in python_entries:
+            file_path = entry['file']
+            self.bindings[file_path] = entry.get('import_bindings') or {}
+            for func in entry.get('functions', []):
+                self.functions[file_path].add(func['name'])
+                self.functions_by_name[func['name']].append(file_path)
+            for cls in entry.get('classes', []):
+                methods = {m['name'] for m in cls.get('methods', [])}
+                self.classes[file_path][cls['name']] = {
+                    'methods': methods,
+                    'bases': cls.get('inheritances', []),
+                }
+                for name in methods:
+                    self.methods_by_name[name].append((file_path, cls['name']))
+
+    def caller(self, file_path, call):
+        """Key and kind of the node making ``call``, or (None, None) for nested/unknown callers."""
+        caller = call.get('caller_function')
+        caller_class = call.get('caller_class')
+        if caller_class:
+            cls = self.classes[file_path].get(caller_class)
+            if cls and caller in cls['methods']:
+                return method_key(file_path, caller_class, caller), 'method'
+        elif caller in self.functions[file_path]:
+            return function_key(file_path, caller), 'function'
+        return None, None
+
+    def callee(self, file_path, call):
+        """Key and kind of the called node, or (None, None) if it cannot be pinned to one target."""
+        name = call.get('called_function')
+        receiver = call.get('receiver')
+        caller_class = call.get('caller_class')
+
+        if receiver in ('self', 'cls') and caller_class:
+            return self._find_method(file_path, caller_class, name)
+
+        if receiver is None:
+            # Bare name: local definition or explicit import, then a repo-wide unique function.
+            found = self._symbol_in_file(file_path, name)
+            if found[0]:
+                return found
+            candidates = self.functions_by_name.get(name, [])
+            if len(candidates) == 1 and name not in _BUILTIN_NAMES:
+                return function_key(candidates[0], name), 'function'
+            return None, None
+
+        if receiver:
+            binding = self.bindings.get(file_path, {}).get(receiver)
+            if binding:
+                module_file = self._binding_module(file_path, binding)
+                if module_file:
+                    return self._symbol_in_file(module_file, name)
+            found = self._resolve_class(file_path, receiver)
+            if found:
+                return self._find_method(found[0], found[1], name)
+
+        # Method on an arbitrary object: only resolvable if exactly one class defines it.
+        candidates = self.methods_by_name.get(name, [])
+        if len(candidates) == 1 and not name.startswith('__') and name not in _BUILTIN_METHOD_NAMES:
+            target_file, target_class = candidates[0]
+            return method_key(target_file, target_class, name), 'method'
+        return None, None
+
+    def _symbol_in_file(self, file_path, name, depth=0):
+        if name in self.functions.get(file_path, ()):
+            return function_key(file_path, name), 'function'
+        cls = self.classes.get(file_path, {}).get(name)
+        if cls is not None:
+            # Calling a class runs its constructor.
+            return self._find_method(file_path, name, '__init__')
+        binding = self.bindings.get(file_path, {}).get(name)
+        if binding and binding.get('name') and depth < _MAX_DEPTH:
+            # Re-exported name, e.g. ``from .main import Typer`` in a package __init__.
+            return self._imported_symbol(file_path, binding, depth + 1)
+        return None, None
+
+    def _imported_symbol(self, file_path, binding, depth=0):
+        module_file = self.modules.resolve_import(file_path, binding.get('module'), binding.get('level', 0))
+        if module_file:
+            return self._symbol_in_file(module_file, binding['name'], depth)
+        return None, None
+
+    def _binding_module(self, file_path, binding):
+        """File of the module a name is bound to (``import x as y`` or ``from pkg import submodule``)."""
+        module = binding.get('module')
+        level = binding.get('level', 0)
+        if binding.get('name'):
+            submodule = f"{module}.{binding['name']}" if module else binding['name']
+            return self.modules.resolve_import(file_path, submodule, level)
+        return self.modules.resolve_import(file_path, module, level)
+
+    def _resolve_class(self, file_path, class_name, depth=0):
+        """(file, class) a class name refers to from ``file_path``."""
+        class_name = class_name.split('.')[-1]
+        if class_name in self.classes.get(file_path, {}):
+            return file_path, class_name
+        binding = self.bindings.get(file_path, {}).get(class_name)
+        if binding and binding.get('name') and depth < _MAX_DEPTH:
+            module_file = self.modules.resolve_import(file_path, binding.get('module'), binding.get('level', 0))
+            if module_file:
+                return self._resolve_class(module_file, binding['name'], depth + 1)
+        return None
+
+    def _find_method(self, file_path, class_name, name, depth=0):
+        cls = self.classes.get(file_path, {}).get(class_name)
+        if cls is None:
+            return None, None
+        if name in cls['methods']:
+            return method_key(file_path, class_name, name), 'method'
+        if depth < _MAX_DEPTH:
+            for base in cls['bases']:
+                found = self._resolve_class(file_path, base)
+                if found:
+                    result = self._find_method(found[0], found[1], name, depth + 1)
+                    if result[0]:
+                        return result
+        return None, None
+
+
+def resolve_calls(entries):
+    """Annotate every call with ``caller_key``/``callee_key`` (and their kinds).
+
+    Calls whose caller or callee cannot be pinned to exactly one node keep
+    ``None`` keys; returns ``(resolved, unresolved)`` counts.
+    """
+    table = SymbolTable(entries)
+    resolved = 0
+    unresolved = 0
+    for entry in entries:
+        if entry.get('type') != 'python':
+            continue
+        for call in entry.get('calls', []):
+            caller_key, caller_kind = table.caller(entry['file'], call)
+            callee_key, callee_kind = table.callee(entry['file'], call) if caller_key else (None, None)
+            call['caller_key'] = caller_key
+            call['caller_kind'] = caller_kind
+            call['callee_key'] = callee_key
+            call['callee_kind'] = callee_kind
+            call['callee_file'] = callee_key.split('::', 1)[0] if callee_key else None
+            if callee_key:
+                resolved += 1
+            else:
+                unresolved += 1
+    return resolved, unresolved
@@ -0,0 +1,280 @@
+import json
+import hashlib
+import logging
+from pathlib import Path
+from .text_splitter import DocumentChunker
+from .keys import class_key, method_key, function_key
+
+# Per-file and per-chunk messages are DEBUG: at INFO they would be emitted
+# from the innermost loop of every build.
+logger = logging.getLogger(__name__)
+
+
+class GraphRowCollector:
+    """Turns parser file records into ``(phase, row)`` pairs.
+
+    The phases are the ones defined in ``bulk_loader``; every graph writer
+    (online Cypher loader, offline CSV export) consumes the same rows.
+
+    Chunk text is stored once per distinct content: every ``Chunk`` (one
+    per position in a file, linked by FOLLOWS) points through HAS_CONTENT
+    at a ``ChunkContent`` node keyed by the SHA-256 of its text, so license
+    headers, templates and vendored copies share one text, one set of
+    counts and one embedding. ``chunk_contents`` holds the hashes already
+    emitted by this build.
+
+    Code entities are keyed by file and qualified name (see ``keys``), so a
+    second definition of the same name in one file (property setters,
+    ``@overload`` stubs, conditional redefinitions) becomes the same node
+    and the last one wins; each such definition is counted in
+    ``duplicate_definitions`` and logged at DEBUG.
+
+    With a ``body_store`` the text of chunk contents, methods and functions
+    goes into the store and rows carry ``body_hash``/``body_length`` instead
+    of ``content``.
+    """
+
+    def __init__(self, chunker=None, body_store=None):
+        self.chunker = chunker or DocumentChunker(chunk_size=800, chunk_overlap=100)
+        self.body_store = body_store
+        self.unresolved_calls = 0
+        self.duplicate_definitions = 0
+        self.chunk_contents = set()
+
+    def _first_definition(self, keys, key, lineno):
+        """Record ``key`` as defined in the current file; False (and counted) when it already was."""
+        if key not in keys:
+            keys.add(key)
+            return True
+        self.duplicate_definitions += 1
+        logger.debug("%s is defined again at line %s; the later definition replaces the earlier one", key, lineno)
+        return False
+
+    def _with_body(self, row):
+        if self.body_store is not None and row.get("content") is not None:
+            row["body_hash"], row["body_length"] = self.body_store.put(row["content"])
+            row["content"] = None
+        return row
+
+    @staticmethod
+    def _file_hash(file_obj):
+        """Content hash of a file record, falling back to a hash of the record itself."""
+        if file_obj.get('content_hash'):
+            return file_obj['content_hash']
+        return hashlib.sha256(json.dumps(file_obj, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _collect_file_rows(self, file_obj, seen_folders):
+        """Turn one file record into ``(phase, row)`` pairs for the bulk loader.
+
+        Returns the rows and the number of chunks created for the file.
+        Trailing ``calls`` records from a streamed intermediate only
+        contribute call rows.
+        """
+        rows = []
+        file_path = str(file_obj.get('file'))
+        file_type = file_obj.get('type')
+        if file_type == 'calls':
+            self._collect_call_rows(rows, file_path, file_obj.get('calls', []))
+            return rows, 0
+
+        # File node and folder tree
+        rows.append(("files", {"path": file_path, "type": file_type, "line_count": file_obj.get('line_count')}))
+        folder_path = str(Path(file_path).parent)
+        new_folders = []
+        if folder_path not in seen_folders:
+            new_folders.append(folder_path)
+            rows.append(("folders", {"path": folder_path}))
+        rows.append(("folder_contains_file", {"folder": folder_path, "file": file_path}))
+        current_folder = folder_path
+        while current_folder in new_folders:
+            parent_folder = str(Path(current_folder).parent)
+            if parent_folder == current_folder or parent_folder in ('.', ''):
+                break
+            if parent_folder not in seen_folders:
+                new_folders.append(parent_folder)
+                rows.append(("folders", {"path": parent_folder}))
+            rows.append(("folder_contains_folder", {"parent": parent_folder, "child": current_folder}))
+            current_folder = parent_folder
+
+        # Chunked content for documentation-like files
+        chunk_ids = []
+        if file_type in ('markdown', 'text'):
+            content = file_obj.get('content', '')
+            if content and content.strip():
+                chunk_ids = self._create_chunks_for_content(rows, file_path, content, file_type)
+        elif file_type == 'yaml':
+            content = json.dumps(file_obj.get('content', {}))
+            if content and content.strip() and content != '{}':
+                chunk_ids = self._create_chunks_for_content(rows, file_path, content, 'yaml')
+        for chunk_id in chunk_ids:
+            rows.append(("file_contains_chunk", {"file": file_path, "chunk_id": chunk_id}))
+
+        # Classes
+        keys = set()
+        for cls in file_obj.get('classes', []):
+            class_name = cls.get('name')
+            if not class_name:
+                continue
+            cls_key = class_key(file_path, class_name)
+            self._first_definition(keys, cls_key, cls.get('lineno'))
+            rows.append(("classes", {
+                "key": cls_key,
+                "name": class_name,
+                "file": file_path,
+                "decorators": json.dumps(cls.get('decorators', [])),
+                "inheritances": json.dumps(cls.get('inheritances', [])),
+                "lineno": cls.get('lineno'),
+                "end_lineno": cls.get('end_lineno')
+            }))
+            rows.append(("file_defines_class", {"file": file_path, "class_key": cls_key}))
+            for method in cls.get('methods', []):
+                method_name = method.get('name')
+                if not method_name:
+                    continue
+                m_key = method_key(file_path, class_name, method_name)
+                self._first_definition(keys, m_key, method.get('lineno'))
+                rows.append(("methods", self._with_body({
+                    "key": m_key,
+                    "name": method_name,
+                    "class": class_name,
+                    "file": file_path,
+                    "content": method.get('content', ''),
+                    "signature": json.dumps(method.get('signature', {})),
+                    "decorators": json.dumps(method.get('decorators', [])),
+                    "lineno": method.get('lineno'),
+                    "end_lineno": method.get('end_lineno')
+                })))
+                rows.append(("class_defines_method", {"class_key": cls_key, "method_key": m_key}))
+
+        # Functions
+        for func in file_obj.get('functions', []):
+            function_name = func.get('name')
+            if not function_name:
+                continue
+            fn_key = function_key(file_path, function_name)
+            self._first_definition(keys, fn_key, func.get('lineno'))
+            rows.append(("functions", self._with_body({
+                "key": fn_key,
+                "name": function_name,
+                "file": file_path,
+                "content": func.get('content', ''),
+                "signature": json.dumps(func.get('signature', {})),
+                "decorators": json.dumps(func.get('decorators', [])),
+                "lineno": func.get('lineno'),
+                "end_lineno": func.get('end_lineno')
+            })))
+            rows.append(("file_defines_function", {"file": file_path, "function_key": fn_key}))
+
+        # Calls
+        self._collect_call_rows(rows, file_path, file_obj.get('calls', []))
+
+        # Imports: IMPORTS edges to the repository files they resolve to, USES edges to third-party libraries
+        self._collect_import_rows(rows, file_path, file_obj.get('imports', []))
+
+        rows.append(("file_hashes", {"path": file_path, "content_hash": self._file_hash(file_obj)}))
+        seen_folders.update(new_folders)
+        return rows, len(chunk_ids)
+
+    @staticmethod
+    def _collect_import_rows(rows, file_path, imports):
+        seen = set()
+        for imp in imports:
+            if imp.get('type') == 'internal' and imp.get('file'):
+                row = ("file_imports_file", {"file": file_path, "target": str(imp['file'])})
+            elif imp.get('type') == 'external' and imp.get('module'):
+                row = ("file_uses_library", {"file": file_path, "module": str(imp['module'])})
+            else:
+                continue
+            key = (row[0], tuple(row[1].values()))
+            if key not in seen and row[1].get("target") != file_path:
+                seen.add(key)
+                rows.append(row)
+
+    def _collect_call_rows(self, rows, file_path, calls):
+        """Queue CALLS edges for calls the parser resolved to a single caller and callee key.
+
+        Unresolved calls are counted in ``unresolved_calls`` instead of being
+        fanned out to every node with the same name.
+        """
+        seen = set()
+        for call in calls:
+            caller_key = call.get('caller_key')
+            callee_key = call.get('callee_key')
+            if not caller_key or not callee_key:
+                self.unresolved_calls += 1
+                continue
+            if (caller_key, callee_key) in seen:
+                continue
+            seen.add((caller_key, callee_key))
+            phase = f"calls_{call['caller_kind']}_{call['callee_kind']}"
+            rows.append((phase, {
+                "caller_key": caller_key,
+                "callee_key": callee_key,
+                "caller": call.get('caller_function'),
+                "caller_class": call.get('caller_class'),
+                "called": call.get('called_function')
+            }))
+
+    def _create_chunks_for_content(self, rows, source_id, content, content_type):
+        """Create chunk rows for content and link them with FOLLOWS relationships
+        Returns list of created chunk IDs
+
+        ``start_offset``/``end_offset`` index into ``content`` (the file text,
+        or its JSON serialisation for YAML files)."""
+        logger.debug("_create_chunks_for_content called: source_id=%s, content_type=%s, content_length=%d",
+                     source_id, content_type, len(content))
+
+        if not content or not content.strip():
+            logger.debug("No content to chunk for %s", source_id)
+            return []
+
+        try:
+            # Split content into chunks
+            chunks = list(self.chunker.iter_chunks(content))
+            logger.debug("Text splitter created %d chunks for %s", len(chunks), source_id)
+            if not chunks:
+                return []
+
+            chunk_metadata = self.chunker.create_chunk_metadata(source_id, chunks)
+            chunk_ids = []
+
+            # Create all chunk nodes, each pointing at the node holding its text
+            for chunk_data in chunk_metadata:
+                text_hash = hashlib.sha256(chunk_data["content"].encode('utf-8')).hexdigest()
+                if text_hash not in self.chunk_contents:
+                    self.chunk_contents.add(text_hash)
+                    content_row = {
+                        "hash": text_hash,
+                        "content": chunk_data["content"],
+                        "char_count": chunk_data["char_count"],
+                        "word_count": chunk_data["word_count"]
+                    }
+                    if "token_count" in chunk_data:
+                        content_row["token_count"] = chunk_data["token_count"]
+                    rows.append(("chunk_contents", self._with_body(content_row)))
+                rows.append(("chunks", {
+                    "id": chunk_data["id"],
+                    "chunk_index": chunk_data["chunk_index"],
+                    "total_chunks": chunk_data["total_chunks"],
+                    "source_id": source_id,
+                    "content_type": content_type,
+                    "start_offset": chunk_data["start_offset"],
+                    "end_offset": chunk_data["end_offset"],
+                    "content_hash": text_hash
+                }))
+                rows.append(("chunk_has_content", {"chunk_id": chunk_data["id"], "hash": text_hash}))
+                chunk_ids.append(chunk_data["id"])
+
+            # Create FOLLOWS relationships between consecutive chunks
+            for i in range(1, len(chunk_metadata)):
+                rows.append(("chunk_follows", {
+                    "prev_id": chunk_metadata[i-1]["id"],
+                    "curr_id": chunk_metadata[i]["id"]
+                }))
+
+            logger.debug("Queued %d chunk nodes and %d FOLLOWS relationships", len(chunk_ids), len(chunk_metadata) - 1)
+            return chunk_ids
+
+        except Exception as e:
+            logger.exception("Error creating chunks for %s: %s", source_id, e)
+            return []
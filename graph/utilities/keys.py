@@ -0,0 +1,18 @@
+"""Stable identity keys for code entities.
+
+Keys are built from the defining file and the qualified name only, so the
+same symbol always maps to the same node and two same-named symbols in
+different files never collide.
+"""
+
+
+def class_key(file_path, class_name):
+    return f"{file_path}::{class_name}"
+
+
+def method_key(file_path, class_name, method_name):
+    return f"{file_path}::{class_name}.{method_name}"
+
+
+def function_key(file_path, function_name):
+    return f"{file_path}::{function_name}"
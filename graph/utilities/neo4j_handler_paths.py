@@ -1,314 +1,616 @@
-import json
+import hashlib
+import logging
+import time
 from pathlib import Path
 from neo4j import GraphDatabase
 from .text_splitter import DocumentChunker
+from .bulk_loader import BulkLoader
+from .graph_rows import GraphRowCollector
+from .record_stream import load_records, TruncatedStreamError
+from .build_report import BuildReport
+from .rollups import compute_rollups
+from .centrality import compute_centrality, STALE_QUERY
+from . import schema
+from . import snapshot
 
-class CodeGraph:
-    def __init__(self, uri, user, password, json_file):
+logger = logging.getLogger(__name__)
+
+# Phases replayed, together with the call phases, for unchanged files that depend on reloaded ones.
+IMPORT_PHASES = ("file_imports_file", "file_uses_library")
+
+# Outgoing IMPORTS and USES of a file.
+FILE_IMPORTS_DELETE_QUERY = (
+    "UNWIND $paths AS path MATCH (:File {repo: $repo, path: path})-[r:USES|IMPORTS]->() DELETE r"
+)
+
+# Remove everything a file owns (chunks, classes, methods, functions, library
+# links and imports) while keeping the File node, its folder edges and the
+# IMPORTS edges pointing at it.
+FILE_SUBGRAPH_DELETE_QUERIES = [
+    "UNWIND $paths AS path MATCH (:File {repo: $repo, path: path})-[:CONTAINS]->(c:Chunk) DETACH DELETE c",
+    "UNWIND $paths AS path MATCH (:File {repo: $repo, path: path})-[:DEFINES]->(:Class)-[:DEFINES]->(m:Method) DETACH DELETE m",
+    "UNWIND $paths AS path MATCH (:File {repo: $repo, path: path})-[:DEFINES]->(n) WHERE n:Class OR n:Function DETACH DELETE n",
+    FILE_IMPORTS_DELETE_QUERY,
+]
+
+# Chunk text no chunk points at any more, once reloaded files have their new chunks.
+ORPHAN_CHUNK_CONTENT_DELETE_QUERY = (
+    schema.repo_scan("ChunkContent", "t") + " AND NOT ()-[:HAS_CONTENT]->(t) "
+    "CALL { WITH t DETACH DELETE t } IN TRANSACTIONS OF $batch_size ROWS"
+)
+
+# Outgoing CALLS of everything a file defines.
+FILE_CALLS_DELETE_QUERY = (
+    "UNWIND $paths AS path "
+    "MATCH (:File {repo: $repo, path: path})-[:DEFINES*1..2]->(caller)-[r:CALLS]->() "
+    "WHERE caller:Function OR caller:Method "
+    "DELETE r"
+)
+
+# Files on either end of an IMPORTS edge of ``$paths``; their import counts
+# change when those files are reloaded or removed.
+IMPORT_NEIGHBOURS_QUERY = (
+    "UNWIND $paths AS path MATCH (:File {repo: $repo, path: path})-[:IMPORTS]-(g:File) "
+    "RETURN DISTINCT g.path AS path"
+)
+
+# Names of the functions and methods ``$paths`` define in the stored graph.
+DEFINED_NAMES_QUERY = (
+    "UNWIND $paths AS path MATCH (:File {repo: $repo, path: path})-[:DEFINES*1..2]->(n) "
+    "WHERE n:Function OR n:Method RETURN DISTINCT n.name AS name"
+)
+
+# Files whose stored IMPORTS or CALLS edges resolved into ``$paths``.
+STORED_DEPENDENTS_QUERY = (
+    "UNWIND $paths AS path MATCH (f:File {repo: $repo, path: path}) "
+    "CALL { "
+    "WITH f MATCH (g:File)-[:IMPORTS]->(f) RETURN g "
+    "UNION "
+    "WITH f MATCH (f)-[:DEFINES*1..2]->(:Function|Method)<-[:CALLS]-(:Function|Method)<-[:DEFINES*1..2]-(g:File) "
+    "RETURN g "
+    "} "
+    "RETURN DISTINCT g.path AS path"
+)
+
+# Batches committed by an interrupted build (written by ``BulkLoader``).
+CHECKPOINT_MATCH = (
+    "MATCH (c:BuildCheckpoint) WHERE c.repo = $repo AND c.phase IS NOT NULL AND c.batch IS NOT NULL "
+)
+
+def _run_write(tx, query, **params):
+    return tx.run(query, **params).single()
+
+def _ancestor_folders(paths):
+    """Folder paths above ``paths``, following the folder tree ``GraphRowCollector`` builds."""
+    folders = set()
+    for path in paths:
+        folder = str(Path(path).parent)
+        while folder not in folders:
+            folders.add(folder)
+            parent = str(Path(folder).parent)
+            if parent == folder or parent in ('.', ''):
+                break
+            folder = parent
+    return folders
+
+class CodeGraph(GraphRowCollector):
+    def __init__(self, uri, user, password, json_file, batch_size=1000, data=None, workers=1,
+                 profile=False, report=None, body_store=None, repo="default", input_hash=None, reach_hops=3,
+                 fulltext=True):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.data = json.load(f)
+        # NDJSON intermediates are read lazily, one record at a time.
+        self.data = data if data is not None else load_records(json_file)
         # Initialize document chunker
-        self.chunker = DocumentChunker(chunk_size=800, chunk_overlap=100)
+        super().__init__(DocumentChunker(chunk_size=800, chunk_overlap=100, count_tokens=True), body_store=body_store)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.profile = profile
+        # Every node and relationship this graph writes, reads or deletes is scoped by this key.
+        self.repo = repo
+        # Identity of the parser input; enables checkpoints (see ``load_checkpoint``).
+        self.input_hash = input_hash
+        self.reach_hops = reach_hops
+        # Without full-text indexes SearchCode has nothing to query (needed with a body store).
+        self.fulltext = fulltext
+        self.completed_batches = {}
+        self.report = report or BuildReport(batch_size=batch_size, workers=workers)
+        self.index_report = {}
 
     def close(self):
         self.driver.close()
 
     def clear_graph(self):
+        """Delete this repository's subgraph; other repositories in the database are untouched."""
+        # Delete in bounded transactions so large graphs do not need one huge transaction state,
+        # label by label so every scan is a seek on the label's (repo, key) index.
+        deleted = 0
+        with self.report.step("clear"), self.driver.session() as session:
+            for label in schema.NODE_KEYS:
+                summary = session.run(
+                    schema.repo_scan(label) + " CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF $batch_size ROWS",
+                    repo=self.repo, batch_size=self.batch_size
+                ).consume()
+                deleted += summary.counters.nodes_deleted
+            session.run(
+                CHECKPOINT_MATCH + "CALL { WITH c DELETE c } IN TRANSACTIONS OF $batch_size ROWS",
+                repo=self.repo, batch_size=self.batch_size
+            ).consume()
+        self.completed_batches = {}
+        self.report.count("nodes_deleted", deleted)
+        print(f"Cleared repository {self.repo}: {deleted} nodes deleted")
+
+    def has_files(self):
+        """Whether the repository already holds a graph (any ``File`` node)."""
+        with self.driver.session() as session:
+            return session.run(schema.repo_scan("File") + " RETURN n.path LIMIT 1", repo=self.repo).single() is not None
+
+    def _checkpoint_key(self):
+        if self.input_hash is None:
+            return None
+        # Batch boundaries also depend on the batch size, on whether rows are sorted
+        # for concurrent writers, and rows on whether bodies go to a body store.
+        settings = f"{self.input_hash}:{self.batch_size}:{self.workers > 1}:{self.body_store is not None}"
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+    def load_checkpoint(self):
+        """Find the batches an interrupted build of the same input already committed.
+
+        Returns ``{(phase, batch): digest}`` for the batches the next
+        non-incremental ``build_graph`` may skip (only those whose rows still
+        have the same digest are). It is empty without an ``input_hash``,
+        without a checkpoint, or when the checkpoint belongs to another input
+        or batch layout; the repository's partial graph must then be cleared.
+        """
+        key = self._checkpoint_key()
+        self.completed_batches = {}
+        if key is None:
+            return self.completed_batches
         with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+            records = session.run(
+                CHECKPOINT_MATCH + "RETURN c.key AS key, c.phase AS phase, c.batch AS batch, c.digest AS digest",
+                repo=self.repo
+            ).data()
+        if records and all(record["key"] == key for record in records):
+            self.completed_batches = {(record["phase"], record["batch"]): record["digest"] for record in records}
+        return self.completed_batches
 
-    def build_graph(self):
-        print(f"Starting to build graph with {len(self.data)} files...")
-        
+    def clear_checkpoint(self):
+        """Forget the checkpoint once the build has finished; the next build starts from a cleared graph."""
         with self.driver.session() as session:
-            processed_count = 0
-            chunked_files_count = 0
-            total_chunks_created = 0
-            
+            session.run(
+                CHECKPOINT_MATCH + "CALL { WITH c DELETE c } IN TRANSACTIONS OF $batch_size ROWS",
+                repo=self.repo, batch_size=self.batch_size
+            ).consume()
+        self.completed_batches = {}
+
+    def ensure_schema(self, timeout=300):
+        """Create the loader's constraints and lookup indexes and wait for them to come online."""
+        states = schema.ensure_schema(self.driver, timeout=timeout, fulltext=self.fulltext)
+        fulltext = len(schema.FULLTEXT_INDEXES) if self.fulltext else 0
+        print(f"Schema ready: {len(schema.CONSTRAINTS)} constraints, {len(schema.INDEXES)} indexes, "
+              f"{fulltext} full-text indexes online")
+        return states
+
+    def print_index_report(self):
+        """Print which indexes were read during the last build."""
+        print("Index usage during build:")
+        for name, usage in sorted(self.index_report.items()):
+            labels = ",".join(usage["labels"] or [])
+            properties = ",".join(usage["properties"] or [])
+            status = "used" if usage["used"] else "unused"
+            print(f"  {name:<24} {labels}({properties}) {status} ({usage['reads']} reads)")
+
+    def build_graph(self, bulk=True, incremental=False):
+        """Load every file record into Neo4j.
+
+        Rows are collected per phase and written with UNWIND batches of
+        ``batch_size`` inside explicit transactions. ``bulk=False`` sends the
+        same statements one row at a time in auto-commit mode. With
+        ``workers > 1`` batches are committed concurrently, phase group by
+        phase group (see ``BulkLoader``). Constraints and
+        lookup indexes are created first, and ``index_report`` records which
+        of them the build actually read. Step timings, per-phase loader
+        statistics and Neo4j query counters are collected in ``report``.
+        A final rollup pass stores overview counts on ``File``/``Folder``
+        nodes and on a single ``RepoSummary`` node, and an analytics pass
+        stores degree, PageRank and reachability scores of the call and
+        import graphs (see ``centrality``).
+
+        With ``incremental=True`` the existing graph is kept: only files whose
+        content hash differs from the one stored on their ``File`` node are
+        deleted and re-created, removed files are dropped, and unchanged files
+        only have their call and import edges rebuilt when they call, import or
+        held an edge into an added, changed or removed file, or call a name one
+        of those defines.
+
+        Every node and relationship is keyed by ``repo``; other repositories
+        in the same database are neither read nor modified.
+
+        With an ``input_hash`` a full build records each committed batch, so
+        after a crash or a Neo4j restart ``load_checkpoint`` followed by
+        ``build_graph`` re-reads the input but skips every batch already in
+        the graph instead of starting again from ``clear_graph``.
+        """
+        mode = "bulk" if bulk else "per-row"
+        source = f"{len(self.data)} files" if isinstance(self.data, list) else "streamed records"
+        print(f"Starting to build graph of repository {self.repo} with {source} "
+              f"({mode} mode{', incremental' if incremental else ''})...")
+
+        report = self.report
+        report.settings.update(mode=mode, incremental=incremental, profile=self.profile, repo=self.repo)
+        with report.step("schema"):
+            self.ensure_schema()
+            usage_before = schema.index_usage(self.driver)
+
+        plan = None
+        if incremental:
+            with report.step("incremental_plan"):
+                plan = self._plan_incremental()
+            print(f"Incremental plan: {len(plan['added'])} added, {len(plan['changed'])} changed, "
+                  f"{len(plan['removed'])} removed, {len(plan['unchanged'])} unchanged, "
+                  f"{len(plan['dependents'])} call/import dependents")
+            report.set_section("incremental", {name: len(paths) for name, paths in plan.items()})
+            # Import neighbours are read before the deletes drop the old edges.
+            rollup_files = self._import_neighbours(plan['changed'] | plan['removed'] | plan['dependents'])
+            with report.step("incremental_delete"):
+                self._delete_file_subgraphs(plan['changed'] | plan['removed'], plan['removed'], plan['dependents'])
+
+        # Incremental builds resume by themselves: files whose hash was not written yet are reloaded.
+        checkpoint = None if incremental else self._checkpoint_key()
+        if checkpoint is not None and self.completed_batches:
+            print(f"Resuming interrupted build: {len(self.completed_batches)} batches already committed")
+            report.count("resumed_batches", len(self.completed_batches))
+        loader = BulkLoader(self.driver, batch_size=self.batch_size, per_row=not bulk,
+                            workers=self.workers, profile=self.profile, repo=self.repo,
+                            checkpoint=checkpoint, completed=self.completed_batches if checkpoint else ())
+        self.unresolved_calls = 0
+        self.duplicate_definitions = 0
+        self.chunk_contents = set()
+        seen_folders = set()
+        processed_count = 0
+        chunked_files_count = 0
+        total_chunks_created = 0
+        load_start = time.perf_counter()
+        collect_seconds = 0.0
+
+        for file_obj in self.data:
+            if file_obj.get('type') == 'stats':
+                # Parser statistics trailing a streamed intermediate.
+                report.set_section("parse", {k: v for k, v in file_obj.items() if k != 'type'})
+                continue
+            file_path = file_obj.get('file')
+            if not file_path:
+                continue
+
+            edges_only = False
+            if plan is not None:
+                if file_path in plan['dependents']:
+                    edges_only = True
+                elif file_path not in plan['added'] and file_path not in plan['changed']:
+                    continue
+
+            if file_obj.get('type') != 'calls':
+                processed_count += 1
+                if processed_count % 50 == 0:
+                    logger.info("Processed %d files...", processed_count)
+
+            collect_start = time.perf_counter()
+            try:
+                rows, chunk_count = self._collect_file_rows(file_obj, seen_folders)
+            except Exception as e:
+                logger.error("Error processing file %s: %s", file_path, e)
+                report.count("file_errors")
+                continue
+            finally:
+                collect_seconds += time.perf_counter() - collect_start
+
+            if edges_only:
+                rows = [(phase, row) for phase, row in rows if phase.startswith("calls_") or phase in IMPORT_PHASES]
+                chunk_count = 0
+
+            if chunk_count:
+                chunked_files_count += 1
+                total_chunks_created += chunk_count
+            for phase, row in rows:
+                loader.add(phase, row)
+
+        if self.body_store is not None:
+            # Bodies are committed before the nodes that reference them.
+            self.body_store.flush()
+        loader.flush()
+        report.steps["collect"] = report.steps.get("collect", 0.0) + collect_seconds
+        # Loading overlaps with reading the (possibly still growing) intermediate.
+        report.steps["load"] = report.steps.get("load", 0.0) + time.perf_counter() - load_start - collect_seconds
+        if plan is not None:
+            with report.step("incremental_delete"):
+                self._prune_chunk_contents()
+        report.add_loader_stats(loader.stats)
+        report.count("files_processed", processed_count)
+        report.count("files_with_chunks", chunked_files_count)
+        report.count("chunks_created", total_chunks_created)
+        report.count("chunk_contents_created", len(self.chunk_contents))
+        report.count("unresolved_calls", self.unresolved_calls)
+        report.count("duplicate_definitions", self.duplicate_definitions)
+        if self.duplicate_definitions:
+            logger.warning("%d definitions were replaced by a same-named one in the same file",
+                           self.duplicate_definitions)
+
+        print(f"Graph build summary:")
+        print(f"  Total files processed: {processed_count}")
+        print(f"  Files with content chunks: {chunked_files_count}")
+        print(f"  Total chunks created: {total_chunks_created} ({len(self.chunk_contents)} distinct texts)")
+        print(f"  Unresolved calls skipped: {self.unresolved_calls}")
+        loader.report()
+        if plan is None:
+            self.compute_rollups()
+        else:
+            reloaded = plan['added'] | plan['changed'] | plan['dependents']
+            rollup_files |= reloaded | self._import_neighbours(reloaded)
+            self.compute_rollups(
+                files=rollup_files - plan['removed'],
+                folders=_ancestor_folders(plan['added'] | plan['changed'] | plan['removed']),
+            )
+        if plan is None:
+            self.compute_centrality()
+        else:
+            # A whole-graph pass would undo the incremental build's savings; scores refresh on the next full build.
+            with self.driver.session() as session:
+                session.run(STALE_QUERY, repo=self.repo).consume()
+            report.set_section("centrality", {"stale": True})
+            print("Centrality not recomputed for an incremental build; scores are marked stale")
+
+        self.index_report = schema.index_usage_report(usage_before, schema.index_usage(self.driver))
+        self.print_index_report()
+        report.set_section("index_usage", self.index_report)
+
+    def compute_rollups(self, files=None, folders=None):
+        """Store folder/file overview counts and the ``RepoSummary`` node (see ``rollups``).
+
+        ``files``/``folders`` limit the pass to those paths (incremental builds).
+        """
+        with self.report.step("rollups"):
+            results = compute_rollups(self.driver, batch_size=self.batch_size, repo=self.repo,
+                                      files=files, folders=folders)
+        self.report.set_section("rollups", results)
+        print(f"Rollups computed: {', '.join(f'{name} ({count} properties)' for name, count in results.items())}")
+
+    def compute_centrality(self):
+        """Store call and import graph scores on methods, functions and files (see ``centrality``)."""
+        with self.report.step("centrality"):
+            results = compute_centrality(self.driver, batch_size=self.batch_size, repo=self.repo,
+                                         hops=self.reach_hops)
+        self.report.set_section("centrality", results)
+        print(f"Centrality computed: {results['calls']['nodes']} methods/functions ({results['calls']['edges']} calls), "
+              f"{results['imports']['nodes']} files ({results['imports']['edges']} imports), "
+              f"reach within {self.reach_hops} hops")
+
+    def export_snapshot(self, directory):
+        """Write this repository's graph to ``directory`` as a columnar snapshot (see ``snapshot``)."""
+        with self.report.step("export_snapshot"):
+            manifest = snapshot.export_neo4j(self.driver, directory, self.repo, batch_size=self.batch_size,
+                                             external_bodies=self.body_store is not None)
+        self.report.set_section("snapshot_export", {"directory": directory, "nodes": manifest["nodes"]})
+        print(f"Snapshot of repository {self.repo} written to {directory}: {sum(manifest['nodes'].values())} nodes, "
+              f"{sum(edge['rows'] for edge in manifest['edges'])} relationships")
+        return manifest
+
+    def restore_snapshot(self, directory):
+        """Replace this repository's graph with the snapshot in ``directory``.
+
+        The snapshot may come from another repository key or from the SQLite
+        backend. The repository is cleared and the schema created before the
+        bulk load, so only the snapshot's nodes and relationships end up in it.
+        """
+        manifest = snapshot.read_manifest(directory)
+        if manifest.get("external_bodies") and self.body_store is None:
+            logger.warning("Snapshot %s keeps bodies in a body store; configure it to read chunk and code text",
+                           directory)
+        self.clear_graph()
+        with self.report.step("schema"):
+            self.ensure_schema()
+        start = time.perf_counter()
+        with self.report.step("restore_snapshot"):
+            _, counters = snapshot.import_neo4j(self.driver, directory, self.repo, batch_size=self.batch_size)
+        self.report.set_section("snapshot_restore", {"directory": directory, "source": manifest["source"],
+                                                     "snapshot_repo": manifest["repo"], **counters})
+        print(f"Restored snapshot {directory} ({manifest['source']}, repository {manifest['repo']}) "
+              f"into {self.repo}: {counters.get('nodes_created', 0)} nodes, "
+              f"{counters.get('relationships_created', 0)} relationships in {time.perf_counter() - start:.2f}s")
+        if manifest["source"] != "neo4j":
+            # Embedded graphs carry no rollup properties and no RepoSummary node to record reach_hops on.
+            self.compute_rollups()
+            self.compute_centrality()
+        return manifest
+
+    def embed_nodes(self, embedder, labels=("ChunkContent",), batch_size=None):
+        """Compute embeddings for ``labels`` nodes and store them in their vector indexes.
+
+        Nodes are paged in id order and only those without an embedding from
+        ``embedder`` are sent to it, so re-running after an incremental build
+        only embeds new or reloaded nodes. Vectors are written back with one
+        UNWIND statement per batch.
+        """
+        batch_size = batch_size or self.batch_size
+        with self.report.step("embed"):
+            self._embed_nodes(embedder, labels, batch_size)
+
+    def _embed_nodes(self, embedder, labels, batch_size):
+        for label in labels:
+            _, id_property, text_property = schema.VECTOR_INDEXES[label]
+            read_query = (
+                f"MATCH (n:{label}) WHERE n.repo = $repo AND n.{id_property} > $after "
+                f"AND (n.embedding IS NULL OR n.embedding_model <> $model) "
+                f"RETURN n.{id_property} AS id, n.{text_property} AS text, n.body_hash AS body_hash "
+                f"ORDER BY n.{id_property} LIMIT $limit"
+            )
+            write_query = (
+                f"UNWIND $rows AS row MATCH (n:{label} {{repo: $repo, {id_property}: row.id}}) "
+                f"SET n.embedding = row.embedding, n.embedding_model = $model"
+            )
+            after = ""
+            embedded = 0
+            index_ready = False
+            if embedder.dimensions:
+                schema.ensure_vector_index(self.driver, label, embedder.dimensions)
+                index_ready = True
+            with self.driver.session() as session:
+                while True:
+                    page = session.run(read_query, repo=self.repo, after=after, model=embedder.name,
+                                       limit=batch_size).data()
+                    if not page:
+                        break
+                    after = page[-1]["id"]
+                    bodies = {}
+                    if self.body_store is not None:
+                        bodies = self.body_store.get_many(row["body_hash"] for row in page if row["body_hash"])
+                    texts = [row["text"] or bodies.get(row["body_hash"]) or "" for row in page]
+                    vectors = embedder.embed_documents(texts)
+                    if not index_ready:
+                        schema.ensure_vector_index(self.driver, label, len(vectors[0]))
+                        index_ready = True
+                    rows = [{"id": row["id"], "embedding": vector} for row, vector in zip(page, vectors)]
+                    session.execute_write(_run_write, write_query, rows=rows, repo=self.repo, model=embedder.name)
+                    embedded += len(rows)
+            print(f"Embedded {embedded} {label} nodes with {embedder.name}")
+            self.report.count(f"embedded_{label.lower()}_nodes", embedded)
+
+    def _plan_incremental(self):
+        """Diff incoming file hashes against the ones stored on ``File`` nodes."""
+        with self.driver.session() as session:
+            stored = {
+                record["path"]: record["content_hash"]
+                for record in session.run(
+                    schema.repo_scan("File", "f") + " RETURN f.path AS path, f.content_hash AS content_hash",
+                    repo=self.repo
+                )
+            }
+
+        # One pass over the input collects the hashes and, for files already in
+        # the graph (the only ones that can be unchanged), what they call and import.
+        # ``removed`` is only meaningful for the complete input: every file a
+        # truncated stream never reached would otherwise be deleted.
+        incoming = {}
+        touched_names = set()
+        call_files = {}
+        call_names = {}
+        import_targets = {}
+        try:
             for file_obj in self.data:
-                try:
-                    file_path = file_obj.get('file')
-                    if not file_path:
-                        continue
-
-                    processed_count += 1
-                    if processed_count % 50 == 0:
-                        print(f"Processed {processed_count} files...")
-
-                    # File node
-                    session.run(
-                        "MERGE (f:File {path: $file_path})",
-                        file_path=str(file_path)
+                path = file_obj.get('file')
+                if not path:
+                    continue
+                path = str(path)
+                if file_obj.get('type') != 'calls':
+                    incoming[path] = self._file_hash(file_obj)
+                    if stored.get(path) != incoming[path]:
+                        # Added or changed: the names it defines now.
+                        touched_names.update(f.get('name') for f in file_obj.get('functions', []))
+                        for cls in file_obj.get('classes', []):
+                            touched_names.update(m.get('name') for m in cls.get('methods', []))
+                if path in stored:
+                    for call in file_obj.get('calls', []):
+                        call_files.setdefault(path, set()).add(call.get('callee_file'))
+                        call_names.setdefault(path, set()).add(call.get('called_function'))
+                    for imp in file_obj.get('imports', []):
+                        if imp.get('file'):
+                            import_targets.setdefault(path, set()).add(str(imp['file']))
+        except TruncatedStreamError as e:
+            raise RuntimeError(f"Incremental build of {self.repo} aborted, nothing was deleted: {e}") from e
+
+        added = {path for path in incoming if path not in stored}
+        changed = {path for path in incoming if path in stored and stored[path] != incoming[path]}
+        removed = {path for path in stored if path not in incoming}
+        unchanged = set(incoming) - added - changed
+
+        # Unchanged files lose their edges into deleted nodes, and their calls
+        # and imports may resolve differently now, so their call and import
+        # edges are rebuilt when they call or import an added, changed or
+        # removed file, call a name one of those defines (before or after the
+        # change), or held a stored edge into a changed or removed file. The
+        # stored names and edges are read before the deletes.
+        touched = added | changed | removed
+        dependents = set()
+        if touched:
+            replaced = sorted(changed | removed)
+            with self.driver.session() as session:
+                for i in range(0, len(replaced), self.batch_size):
+                    batch = replaced[i:i + self.batch_size]
+                    touched_names.update(
+                        record["name"] for record in session.run(DEFINED_NAMES_QUERY, paths=batch, repo=self.repo)
                     )
-                    folder_path = str(Path(file_path).parent)
-                    session.run(
-                        "MERGE (d:Folder {path: $folder_path})",
-                        folder_path=folder_path
+                    dependents.update(
+                        record["path"] for record in session.run(STORED_DEPENDENTS_QUERY, paths=batch, repo=self.repo)
                     )
-                    session.run(
-                        "MATCH (f:File {path: $file_path}), (d:Folder {path: $folder_path}) "
-                        "MERGE (d)-[:CONTAINS]->(f)",
-                        file_path=str(file_path), folder_path=folder_path
+            touched_names.discard(None)
+            for path in unchanged:
+                if (call_files.get(path, set()) & touched or call_names.get(path, set()) & touched_names
+                        or import_targets.get(path, set()) & touched):
+                    dependents.add(path)
+            dependents &= unchanged
+
+        return {
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+            "unchanged": unchanged,
+            "dependents": dependents,
+        }
+
+    def _import_neighbours(self, paths):
+        """Paths of the files importing or imported by ``paths``."""
+        paths = sorted(paths)
+        neighbours = set()
+        with self.driver.session() as session:
+            for i in range(0, len(paths), self.batch_size):
+                neighbours.update(
+                    record["path"] for record in session.run(
+                        IMPORT_NEIGHBOURS_QUERY, paths=paths[i:i + self.batch_size], repo=self.repo
                     )
-                    current_folder = folder_path
-                    while True:
-                        parent_folder = str(Path(current_folder).parent)
-                        if parent_folder == current_folder or parent_folder in ('.', ''):
-                            break
-                        session.run(
-                            "MERGE (p:Folder {path: $parent_folder})",
-                            parent_folder=parent_folder
-                        )
-                        session.run(
-                            "MATCH (p:Folder {path: $parent_folder}), (c:Folder {path: $current_folder}) "
-                            "MERGE (p)-[:CONTAINS]->(c)",
-                            parent_folder=parent_folder, current_folder=current_folder
-                        )
-                        current_folder = parent_folder
-
-                    # Handle files based on their type field from JSON
-                    file_type = file_obj.get('type')
-                    
-                    if file_type == 'markdown':
-                        content = file_obj.get('content', '')
-                        session.run(
-                            "MERGE (f:File {path: $file_path}) SET f:Markdown",
-                            file_path=str(file_path)
-                        )
-                        if content and content.strip():
-                            chunked_files_count += 1
-                            chunk_ids = self._create_chunks_for_content(session, file_path, content, 'markdown')
-                            total_chunks_created += len(chunk_ids)
-                            if chunked_files_count <= 5:  # Log first few chunked files
-                                print(f"Chunked markdown file {chunked_files_count}: {file_path} -> {len(chunk_ids)} chunks")
-                            if chunk_ids:
-                                for chunk_id in chunk_ids:
-                                    session.run(
-                                        "MATCH (f:File {path: $file_path}) "
-                                        "MATCH (c:Chunk {id: $chunk_id}) "
-                                        "MERGE (f)-[:CONTAINS]->(c)",
-                                        file_path=str(file_path), chunk_id=chunk_id
-                                    )
-                    
-                    elif file_type == 'text':
-                        content = file_obj.get('content', '')
-                        session.run(
-                            "MERGE (f:File {path: $file_path}) SET f:TextFile",
-                            file_path=str(file_path)
-                        )
-                        if content and content.strip():
-                            chunked_files_count += 1
-                            chunk_ids = self._create_chunks_for_content(session, file_path, content, 'text')
-                            total_chunks_created += len(chunk_ids)
-                            if chunked_files_count <= 5:  # Log first few chunked files
-                                print(f"Chunked text file {chunked_files_count}: {file_path} -> {len(chunk_ids)} chunks")
-                            if chunk_ids:
-                                for chunk_id in chunk_ids:
-                                    session.run(
-                                        "MATCH (f:File {path: $file_path}) "
-                                        "MATCH (c:Chunk {id: $chunk_id}) "
-                                        "MERGE (f)-[:CONTAINS]->(c)",
-                                        file_path=str(file_path), chunk_id=chunk_id
-                                    )
-                    
-                    elif file_type == 'yaml':
-                        content = json.dumps(file_obj.get('content', {}))
-                        session.run(
-                            "MERGE (f:File {path: $file_path}) SET f:YAML",
-                            file_path=str(file_path)
-                        )
-                        if content and content.strip() and content != '{}':
-                            chunk_ids = self._create_chunks_for_content(session, file_path, content, 'yaml')
-                            if chunk_ids:
-                                for chunk_id in chunk_ids:
-                                    session.run(
-                                        "MATCH (f:File {path: $file_path}) "
-                                        "MATCH (c:Chunk {id: $chunk_id}) "
-                                        "MERGE (f)-[:CONTAINS]->(c)",
-                                        file_path=str(file_path), chunk_id=chunk_id
-                                    )
-                    
-                    else:  # Python files and others
-                        session.run(
-                            "MERGE (f:File {path: $file_path})",
-                            file_path=str(file_path)
-                        )
-
-                    # Classes
-                    for cls in file_obj.get('classes', []):
-                        class_name = cls.get('name')
-                        if not class_name:
-                            continue
-                        session.run(
-                            "MERGE (c:Class {name: $class_name, decorators: $decorators, inheritances: $inheritances})",
-                            class_name=class_name,
-                            decorators=json.dumps(cls.get('decorators', [])),
-                            inheritances=json.dumps(cls.get('inheritances', []))
-                        )
-                        session.run(
-                            "MATCH (f:File {path: $file_path}), (c:Class {name: $class_name}) "
-                            "MERGE (f)-[:DEFINES]->(c)",
-                            file_path=str(file_path), class_name=class_name
-                        )
-                        for method in cls.get('methods', []):
-                            method_name = method.get('name')
-                            if not method_name:
-                                continue
-                            session.run(
-                                "MERGE (m:Method {name: $method_name, class: $class_name, content: $content, signature: $signature, decorators: $decorators})",
-                                method_name=method_name,
-                                class_name=class_name,
-                                content=method.get('content', ''),
-                                signature=json.dumps(method.get('signature', {})),
-                                decorators=json.dumps(method.get('decorators', []))
-                            )
-                            session.run(
-                                "MATCH (c:Class {name: $class_name}), (m:Method {name: $method_name, class: $class_name}) "
-                                "MERGE (c)-[:DEFINES]->(m)",
-                                class_name=class_name, method_name=method_name
-                            )
-
-                    # Functions
-                    for func in file_obj.get('functions', []):
-                        function_name = func.get('name')
-                        if not function_name:
-                            continue
-                        session.run(
-                            "MERGE (fn:Function {name: $function_name, content: $content, signature: $signature, decorators: $decorators})",
-                            function_name=function_name,
-                            content=func.get('content', ''),
-                            signature=json.dumps(func.get('signature', {})),
-                            decorators=json.dumps(func.get('decorators', []))
-                        )
-                        session.run(
-                            "MATCH (f:File {path: $file_path}), (fn:Function {name: $function_name}) "
-                            "MERGE (f)-[:DEFINES]->(fn)",
-                            file_path=str(file_path), function_name=function_name
-                        )
-
-                    # Calls
-                    for call in file_obj.get('calls', []):
-                        caller = call.get('caller_function')
-                        caller_class = call.get('caller_class')
-                        called = call.get('called_function')
-                        if not caller or not called:
-                            continue
-                        if caller_class:
-                            # Method to method calls (same or different class)
-                            session.run(
-                                "MATCH (m:Method {name: $caller, class: $caller_class}) "
-                                "MATCH (t:Method {name: $called}) "
-                                "MERGE (m)-[:CALLS {caller_function: $caller, caller_class: $caller_class, called_function: $called}]->(t)",
-                                caller=caller, caller_class=caller_class, called=called
-                            )
-                            # Method to function calls
-                            session.run(
-                                "MATCH (m:Method {name: $caller, class: $caller_class}) "
-                                "MATCH (fn:Function {name: $called}) "
-                                "MERGE (m)-[:CALLS {caller_function: $caller, caller_class: $caller_class, called_function: $called}]->(fn)",
-                                caller=caller, caller_class=caller_class, called=called
-                            )
-                        else:
-                            session.run(
-                                "MATCH (fn:Function {name: $caller}), (t:Function {name: $called}) "
-                                "MERGE (fn)-[:CALLS {caller_function: $caller, called_function: $called}]->(t)",
-                                caller=caller, called=called
-                            )
-                            session.run(
-                                "MATCH (fn:Function {name: $caller}), (m:Method {name: $called}) "
-                                "MERGE (fn)-[:CALLS {caller_function: $caller, called_function: $called}]->(m)",
-                                caller=caller, called=called
-                            )
-
-                    # Create USES relationships for external imports (simplified)
-                    external_imports = [imp.get('module') for imp in file_obj.get('imports', []) if imp.get('type') == 'external']
-                    if external_imports:
-                        for module_name in external_imports[:5]:  # Limit to avoid too many relationships
-                            if module_name:
-                                session.run(
-                                    "MERGE (lib:Library {name: $module_name}) "
-                                    "WITH lib "
-                                    "MATCH (f:File {path: $file_path}) "
-                                    "MERGE (f)-[:USES]->(lib)",
-                                    file_path=str(file_path), module_name=str(module_name)
-                                )
-
-                except Exception as e:
-                    print(f"Error processing file {file_path}: {e}")
-                    continue
+                )
+        return neighbours
 
-            print(f"Graph build summary:")
-            print(f"  Total files processed: {processed_count}")
-            print(f"  Files with content chunks: {chunked_files_count}")
-            print(f"  Total chunks created: {total_chunks_created}")
-
-    def _create_chunks_for_content(self, session, source_id, content, content_type):
-        """Create chunks for content and link them with FOLLOWS relationships
-        Returns list of created chunk IDs"""
-        print(f"_create_chunks_for_content called: source_id={source_id}, content_type={content_type}, content_length={len(content)}")
-        
-        if not content or not content.strip():
-            print(f"No content to chunk for {source_id}")
-            return []
-        
-        try:
-            # Split content into chunks
-            chunks = self.chunker.split_text(content)
-            print(f"Text splitter created {len(chunks)} chunks for {source_id}")
-            if not chunks:
-                return []
-                
-            chunk_metadata = self.chunker.create_chunk_metadata(source_id, chunks)
-            print(f"Created metadata for {len(chunk_metadata)} chunks")
-            chunk_ids = []
-            
-            # Create all chunk nodes
-            for i, chunk_data in enumerate(chunk_metadata):
-                print(f"Creating chunk {i+1}/{len(chunk_metadata)}: {chunk_data['id']}")
-                session.run("""
-                    CREATE (c:Chunk {
-                        id: $chunk_id,
-                        content: $content,
-                        chunk_index: $chunk_index,
-                        total_chunks: $total_chunks,
-                        source_id: $source_id,
-                        content_type: $content_type,
-                        char_count: $char_count,
-                        word_count: $word_count
-                    })
-                """, {
-                    "chunk_id": chunk_data["id"],
-                    "content": chunk_data["content"],
-                    "chunk_index": chunk_data["chunk_index"],
-                    "total_chunks": chunk_data["total_chunks"],
-                    "source_id": source_id,
-                    "content_type": content_type,
-                    "char_count": chunk_data["char_count"],
-                    "word_count": chunk_data["word_count"]
-                })
-                chunk_ids.append(chunk_data["id"])
-            
-            print(f"Created {len(chunk_ids)} chunk nodes")
-            
-            # Create FOLLOWS relationships between consecutive chunks
-            for i in range(1, len(chunk_metadata)):
-                prev_chunk_id = chunk_metadata[i-1]["id"]
-                curr_chunk_id = chunk_metadata[i]["id"]
-                
-                print(f"Creating FOLLOWS relationship: {prev_chunk_id} -> {curr_chunk_id}")
-                session.run("""
-                    MATCH (prev:Chunk {id: $prev_id})
-                    MATCH (curr:Chunk {id: $curr_id})
-                    MERGE (prev)-[:FOLLOWS]->(curr)
-                """, {"prev_id": prev_chunk_id, "curr_id": curr_chunk_id})
-            
-            print(f"Created {len(chunk_metadata)-1} FOLLOWS relationships")
-            return chunk_ids
-                
-        except Exception as e:
-            print(f"Error creating chunks for {source_id}: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+    def _prune_chunk_contents(self):
+        """Delete chunk text left without chunks by an incremental build.
 
+        Runs after the load rather than with the deletes, so text that a
+        reloaded file still contains keeps its node and its embedding.
+        """
+        with self.driver.session() as session:
+            summary = session.run(ORPHAN_CHUNK_CONTENT_DELETE_QUERY, repo=self.repo,
+                                  batch_size=self.batch_size).consume()
+        self.report.count("chunk_contents_pruned", summary.counters.nodes_deleted)
+
+    def _delete_file_subgraphs(self, paths, removed, dependents=()):
+        """Delete the subgraphs of ``paths`` in batches, drop ``removed`` files entirely
+        and clear the outgoing CALLS, IMPORTS and USES of ``dependents`` so they can be replayed."""
+        paths = sorted(paths)
+        with self.driver.session() as session:
+            dependents = sorted(dependents)
+            for i in range(0, len(dependents), self.batch_size):
+                for query in (FILE_CALLS_DELETE_QUERY, FILE_IMPORTS_DELETE_QUERY):
+                    session.execute_write(_run_write, query, paths=dependents[i:i + self.batch_size], repo=self.repo)
+            for i in range(0, len(paths), self.batch_size):
+                batch = paths[i:i + self.batch_size]
+                for query in FILE_SUBGRAPH_DELETE_QUERIES:
+                    session.execute_write(_run_write, query, paths=batch, repo=self.repo)
+            removed = sorted(removed)
+            for i in range(0, len(removed), self.batch_size):
+                session.execute_write(
+                    _run_write,
+                    "UNWIND $paths AS path MATCH (f:File {repo: $repo, path: path}) DETACH DELETE f",
+                    paths=removed[i:i + self.batch_size], repo=self.repo
+                )
+            if removed:
+                # Prune folders left empty, bottom-up, and libraries nobody uses any more.
+                while session.execute_write(
+                    _run_write,
+                    schema.repo_scan("Folder", "d") + " AND NOT (d)-[:CONTAINS]->() "
+                    "DETACH DELETE d RETURN count(d) AS deleted",
+                    repo=self.repo
+                )["deleted"]:
+                    pass
+            session.execute_write(
+                _run_write,
+                schema.repo_scan("Library", "l") + " AND NOT ()-[:USES]->(l) DELETE l",
+                repo=self.repo
+            )
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+
+# Last line of every NDJSON intermediate; readers following a file that is
+# still being written stop here.
+END_OF_STREAM = {"type": "end"}
+
+
+class TruncatedStreamError(RuntimeError):
+    """An NDJSON intermediate ended without its end-of-stream marker."""
+
+
+def is_ndjson(path):
+    return str(path).endswith(('.ndjson', '.jsonl'))
+
+
+class NDJSONRecords:
+    """Re-iterable, lazily parsed view over an NDJSON file of parser records.
+
+    Each iteration re-opens the file and yields one record per line, so only
+    a single record is held in memory at a time. With ``follow=True`` the
+    reader waits for lines that have not been written yet (for a parser
+    running concurrently) until the end-of-stream marker arrives or
+    ``is_writing()`` reports that the writer has exited.
+
+    A file that ends without the marker was cut short (the writer crashed or
+    was killed), and iterating it raises ``TruncatedStreamError`` once the
+    records it does hold have been yielded.
+    """
+
+    def __init__(self, path, follow=False, is_writing=None, poll_interval=0.2):
+        self.path = path
+        self.follow = follow
+        self.is_writing = is_writing or (lambda: False)
+        self.poll_interval = poll_interval
+
+    def __iter__(self):
+        while self.follow and not os.path.exists(self.path):
+            if not self.is_writing():
+                raise FileNotFoundError(self.path)
+            time.sleep(self.poll_interval)
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            pending = ''
+            while True:
+                line = f.readline()
+                if not line and self.follow and self.is_writing():
+                    time.sleep(self.poll_interval)
+                    continue
+                if not line and self.follow:
+                    # The writer may have finished between the read and the check above.
+                    line = f.readline()
+                if not line:
+                    raise TruncatedStreamError(
+                        f"{self.path} ended without the end-of-stream marker; the parser did not finish"
+                    )
+                pending += line
+                if not pending.endswith('\n') and self.follow:
+                    # Partially flushed line; wait for the rest of it.
+                    continue
+                record = json.loads(pending)
+                pending = ''
+                if record == END_OF_STREAM:
+                    return
+                yield record
+
+
+def load_records(path, **kwargs):
+    """Return parser records from ``path``: a lazy reader for NDJSON, a list for JSON."""
+    if is_ndjson(path):
+        return NDJSONRecords(path, **kwargs)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
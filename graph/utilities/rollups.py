@@ -0,0 +1,113 @@
+# Post-load aggregation pass. Overview numbers are stored on the nodes
+# they describe so the query tools read one node instead of re-aggregating
+# the whole graph per question. Each query runs in batched implicit
+# transactions, file level first because folders sum the file values.
+# Every pass covers one repository (``$repo``); relationships never cross
+# repositories, so traversals from its nodes stay inside it.
+
+FILE_ROLLUP_BODY = (
+    "CALL { WITH f "
+    "SET f.class_count = COUNT { (f)-[:DEFINES]->(:Class) }, "
+    "f.method_count = COUNT { (f)-[:DEFINES]->(:Class)-[:DEFINES]->(:Method) }, "
+    "f.function_count = COUNT { (f)-[:DEFINES]->(:Function) }, "
+    "f.chunk_count = COUNT { (f)-[:CONTAINS]->(:Chunk) }, "
+    "f.library_count = COUNT { (f)-[:USES]->(:Library) }, "
+    "f.import_count = COUNT { (f)-[:IMPORTS]->(:File) }, "
+    "f.imported_by_count = COUNT { (:File)-[:IMPORTS]->(f) } "
+    "} IN TRANSACTIONS OF $batch_size ROWS"
+)
+FILE_ROLLUP = "MATCH (f:File) WHERE f.repo = $repo AND f.path IS NOT NULL " + FILE_ROLLUP_BODY
+FILE_ROLLUP_PATHS = "UNWIND $paths AS path MATCH (f:File {repo: $repo, path: path}) " + FILE_ROLLUP_BODY
+
+# Folder totals include every subfolder; file_count/subfolder_count are direct children only.
+FOLDER_ROLLUP_BODY = (
+    "CALL { WITH d "
+    "OPTIONAL MATCH (d)-[:CONTAINS*1..]->(f:File) "
+    "WITH d, count(f) AS files, sum(coalesce(f.line_count, 0)) AS loc, "
+    "sum(coalesce(f.class_count, 0)) AS classes, sum(coalesce(f.method_count, 0)) AS methods, "
+    "sum(coalesce(f.function_count, 0)) AS functions, "
+    "sum(CASE WHEN f.path ENDS WITH '.py' THEN 1 ELSE 0 END) AS python_files "
+    "SET d.total_files = files, d.python_files = python_files, d.loc = loc, "
+    "d.class_count = classes, d.method_count = methods, d.function_count = functions, "
+    "d.file_count = COUNT { (d)-[:CONTAINS]->(:File) }, "
+    "d.subfolder_count = COUNT { (d)-[:CONTAINS]->(:Folder) } "
+    "WITH d "
+    "OPTIONAL MATCH (d)-[:CONTAINS*1..]->(:File)-[:USES]->(l:Library) "
+    "WITH d, l.name AS library, count(l) AS uses "
+    "ORDER BY uses DESC, library "
+    "WITH d, [x IN collect({name: library, uses: uses}) WHERE x.name IS NOT NULL][..5] AS top "
+    "SET d.top_libraries = [x IN top | x.name], d.top_library_uses = [x IN top | x.uses] "
+    "} IN TRANSACTIONS OF $batch_size ROWS"
+)
+FOLDER_ROLLUP = "MATCH (d:Folder) WHERE d.repo = $repo AND d.path IS NOT NULL " + FOLDER_ROLLUP_BODY
+FOLDER_ROLLUP_PATHS = "UNWIND $paths AS path MATCH (d:Folder {repo: $repo, path: path}) " + FOLDER_ROLLUP_BODY
+
+REPO_SUMMARY = (
+    "MERGE (s:RepoSummary {repo: $repo}) "
+    "SET s.id = $repo, "
+    "s.folders = COUNT { (n:Folder) WHERE n.repo = $repo AND n.path IS NOT NULL }, "
+    "s.files = COUNT { (n:File) WHERE n.repo = $repo AND n.path IS NOT NULL }, "
+    "s.python_files = COUNT { (n:File) WHERE n.repo = $repo AND n.path ENDS WITH '.py' }, "
+    "s.markdown_files = COUNT { (n:Markdown) WHERE n.repo = $repo }, "
+    "s.text_files = COUNT { (n:TextFile) WHERE n.repo = $repo }, "
+    "s.yaml_files = COUNT { (n:YAML) WHERE n.repo = $repo }, "
+    "s.classes = COUNT { (n:Class) WHERE n.repo = $repo AND n.key IS NOT NULL }, "
+    "s.methods = COUNT { (n:Method) WHERE n.repo = $repo AND n.key IS NOT NULL }, "
+    "s.functions = COUNT { (n:Function) WHERE n.repo = $repo AND n.key IS NOT NULL }, "
+    "s.chunks = COUNT { (n:Chunk) WHERE n.repo = $repo AND n.id IS NOT NULL }, "
+    "s.unique_chunks = COUNT { (n:ChunkContent) WHERE n.repo = $repo AND n.hash IS NOT NULL }, "
+    "s.libraries = COUNT { (n:Library) WHERE n.repo = $repo AND n.name IS NOT NULL }, "
+    "s.calls = COUNT { (n:Method)-[:CALLS]->() WHERE n.repo = $repo AND n.key IS NOT NULL } "
+    "+ COUNT { (n:Function)-[:CALLS]->() WHERE n.repo = $repo AND n.key IS NOT NULL }, "
+    "s.imports = COUNT { (n:File)-[:IMPORTS]->() WHERE n.repo = $repo AND n.path IS NOT NULL }, "
+    "s.updated_at = datetime() "
+    "WITH s "
+    "OPTIONAL MATCH (f:File) WHERE f.repo = $repo AND f.path IS NOT NULL "
+    "WITH s, sum(coalesce(f.line_count, 0)) AS loc "
+    "SET s.loc = loc "
+    "WITH s "
+    "OPTIONAL MATCH (f:File)-[:USES]->(l:Library) WHERE f.repo = $repo AND f.path IS NOT NULL "
+    "WITH s, l.name AS library, count(l) AS uses "
+    "ORDER BY uses DESC, library "
+    "WITH s, [x IN collect({name: library, uses: uses}) WHERE x.name IS NOT NULL][..10] AS top "
+    "SET s.top_libraries = [x IN top | x.name], s.top_library_uses = [x IN top | x.uses] "
+    "WITH s "
+    "OPTIONAL MATCH (d:Folder) WHERE d.repo = $repo AND d.path IS NOT NULL AND NOT ()-[:CONTAINS]->(d) "
+    "WITH s, collect(d.path) AS roots "
+    "SET s.root_folders = roots "
+    "WITH s "
+    "OPTIONAL MATCH (d:Folder) WHERE d.repo = $repo AND d.path IS NOT NULL "
+    "WITH s, d ORDER BY d.total_files DESC, d.path LIMIT 10 "
+    "WITH s, [x IN collect(d) WHERE x IS NOT NULL] AS largest "
+    "SET s.largest_folders = [d IN largest | d.path], s.largest_folder_files = [d IN largest | d.total_files]"
+)
+
+ROLLUP_QUERIES = [
+    ("files", FILE_ROLLUP),
+    ("folders", FOLDER_ROLLUP),
+    ("repo", REPO_SUMMARY),
+]
+
+
+def compute_rollups(driver, batch_size=1000, repo="default", files=None, folders=None):
+    """Run the rollup pass for ``repo`` and return ``{step: properties set}``.
+
+    With ``files`` and ``folders`` (paths) only those File and Folder nodes
+    are recomputed, which is what an incremental build needs: the reloaded
+    and import-neighbouring files and the ancestor folders of every file
+    that changed. The RepoSummary is always rebuilt.
+    """
+    if files is None and folders is None:
+        queries = [(name, query, {}) for name, query in ROLLUP_QUERIES]
+    else:
+        queries = [
+            ("files", FILE_ROLLUP_PATHS, {"paths": sorted(files or ())}),
+            ("folders", FOLDER_ROLLUP_PATHS, {"paths": sorted(folders or ())}),
+            ("repo", REPO_SUMMARY, {}),
+        ]
+    results = {}
+    with driver.session() as session:
+        for name, query, params in queries:
+            summary = session.run(query, batch_size=batch_size, repo=repo, **params).consume()
+            results[name] = summary.counters.properties_set
+    return results
@@ -0,0 +1,168 @@
+# Every node is scoped by a ``repo`` key (repository name, optionally with a
+# version), so one instance holds many repositories. Identity is unique per
+# repository: composite uniqueness constraints lead on ``repo``, and their
+# RANGE indexes serve both the loader's MERGEs and per-repository scans
+# (``n.repo = $repo AND n.<key> IS NOT NULL``).
+NODE_KEYS = {
+    "Folder": "path",
+    "File": "path",
+    "Chunk": "id",
+    "ChunkContent": "hash",
+    "Class": "key",
+    "Method": "key",
+    "Function": "key",
+    "Library": "name",
+    "RepoSummary": "repo",
+}
+
+CONSTRAINTS = {
+    "file_repo_path_unique": "CREATE CONSTRAINT file_repo_path_unique IF NOT EXISTS FOR (n:File) REQUIRE (n.repo, n.path) IS UNIQUE",
+    "folder_repo_path_unique": "CREATE CONSTRAINT folder_repo_path_unique IF NOT EXISTS FOR (n:Folder) REQUIRE (n.repo, n.path) IS UNIQUE",
+    "chunk_repo_id_unique": "CREATE CONSTRAINT chunk_repo_id_unique IF NOT EXISTS FOR (n:Chunk) REQUIRE (n.repo, n.id) IS UNIQUE",
+    "chunk_content_repo_hash_unique": (
+        "CREATE CONSTRAINT chunk_content_repo_hash_unique IF NOT EXISTS FOR (n:ChunkContent) REQUIRE (n.repo, n.hash) IS UNIQUE"
+    ),
+    "library_repo_name_unique": "CREATE CONSTRAINT library_repo_name_unique IF NOT EXISTS FOR (n:Library) REQUIRE (n.repo, n.name) IS UNIQUE",
+    "class_repo_key_unique": "CREATE CONSTRAINT class_repo_key_unique IF NOT EXISTS FOR (n:Class) REQUIRE (n.repo, n.key) IS UNIQUE",
+    "method_repo_key_unique": "CREATE CONSTRAINT method_repo_key_unique IF NOT EXISTS FOR (n:Method) REQUIRE (n.repo, n.key) IS UNIQUE",
+    "function_repo_key_unique": "CREATE CONSTRAINT function_repo_key_unique IF NOT EXISTS FOR (n:Function) REQUIRE (n.repo, n.key) IS UNIQUE",
+    "repo_summary_unique": "CREATE CONSTRAINT repo_summary_unique IF NOT EXISTS FOR (n:RepoSummary) REQUIRE n.repo IS UNIQUE",
+    "build_checkpoint_unique": (
+        "CREATE CONSTRAINT build_checkpoint_unique IF NOT EXISTS FOR (n:BuildCheckpoint) "
+        "REQUIRE (n.repo, n.phase, n.batch) IS UNIQUE"
+    ),
+}
+
+# Name lookups for the query tools, which search code by symbol name within a repository.
+INDEXES = {
+    "method_repo_name": "CREATE INDEX method_repo_name IF NOT EXISTS FOR (n:Method) ON (n.repo, n.name)",
+    "function_repo_name": "CREATE INDEX function_repo_name IF NOT EXISTS FOR (n:Function) ON (n.repo, n.name)",
+    # "Most important code" reads: ORDER BY the centrality scores within a repository.
+    "method_repo_call_pagerank": "CREATE INDEX method_repo_call_pagerank IF NOT EXISTS FOR (n:Method) ON (n.repo, n.call_pagerank)",
+    "function_repo_call_pagerank": "CREATE INDEX function_repo_call_pagerank IF NOT EXISTS FOR (n:Function) ON (n.repo, n.call_pagerank)",
+    "file_repo_import_pagerank": "CREATE INDEX file_repo_import_pagerank IF NOT EXISTS FOR (n:File) ON (n.repo, n.import_pagerank)",
+}
+
+# Full-text (Lucene) indexes for keyword search from the query tools. Code
+# keeps underscores inside tokens so identifiers match whole; paths are split
+# on every non-letter so ``graph/utilities/schema.py`` matches ``schema``.
+FULLTEXT_INDEXES = {
+    "chunk_text": (
+        "CREATE FULLTEXT INDEX chunk_text IF NOT EXISTS FOR (n:ChunkContent) ON EACH [n.content]"
+    ),
+    "code_content": (
+        "CREATE FULLTEXT INDEX code_content IF NOT EXISTS FOR (n:Method|Function|Class) ON EACH [n.name, n.content] "
+        "OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words'}}"
+    ),
+    "file_path": (
+        "CREATE FULLTEXT INDEX file_path IF NOT EXISTS FOR (n:File|Folder) ON EACH [n.path] "
+        "OPTIONS {indexConfig: {`fulltext.analyzer`: 'simple'}}"
+    ),
+}
+
+# Vector indexes over ``embedding``: label -> (index name, id property, text property).
+VECTOR_INDEXES = {
+    "ChunkContent": ("chunk_content_embedding", "hash", "content"),
+    "Method": ("method_embedding", "key", "content"),
+    "Function": ("function_embedding", "key", "content"),
+}
+
+
+def ensure_schema(driver, timeout=300, fulltext=True):
+    """Create missing constraints and indexes and wait until all of them are online.
+
+    Only ``IF NOT EXISTS`` statements are run, so nothing already in the
+    database is dropped or deleted; ``fulltext=False`` leaves out the
+    full-text indexes. Raises RuntimeError if any expected index is missing
+    or not ONLINE after ``timeout`` seconds.
+    """
+    expected = dict(CONSTRAINTS, **INDEXES)
+    if fulltext:
+        expected.update(FULLTEXT_INDEXES)
+    with driver.session() as session:
+        for statement in expected.values():
+            session.run(statement).consume()
+        session.run("CALL db.awaitIndexes($timeout)", timeout=timeout).consume()
+        records = session.run(
+            "SHOW INDEXES YIELD name, state, owningConstraint "
+            "RETURN name, state, owningConstraint"
+        ).data()
+
+    states = {}
+    for record in records:
+        states[record["name"]] = record["state"]
+        if record.get("owningConstraint"):
+            states[record["owningConstraint"]] = record["state"]
+
+    not_ready = [name for name in expected if states.get(name) != "ONLINE"]
+    if not_ready:
+        raise RuntimeError(f"Schema indexes not online: {', '.join(not_ready)}")
+    return states
+
+
+def repo_scan(label, variable="n"):
+    """``MATCH`` clause for every ``label`` node of repository ``$repo``, served by the label's composite index."""
+    return f"MATCH ({variable}:{label}) WHERE {variable}.repo = $repo AND {variable}.{NODE_KEYS[label]} IS NOT NULL"
+
+
+def ensure_vector_index(driver, label, dimensions, timeout=300):
+    """Create the cosine vector index for ``label`` with ``dimensions`` and wait for it.
+
+    The index spans every repository in the database, so an existing index
+    built for a different dimension (another embedder) is left alone and
+    RuntimeError is raised instead: Neo4j cannot hold vectors of two sizes
+    in one index, and dropping it would break search for the other
+    repositories.
+    """
+    name = VECTOR_INDEXES[label][0]
+    with driver.session() as session:
+        existing = session.run(
+            "SHOW INDEXES YIELD name, options WHERE name = $name RETURN options",
+            name=name
+        ).single()
+        if existing is not None:
+            config = (existing["options"] or {}).get("indexConfig", {})
+            if config.get("vector.dimensions") != dimensions:
+                raise RuntimeError(
+                    f"Vector index {name} holds {config.get('vector.dimensions')}-dimensional embeddings, "
+                    f"not {dimensions}: embed with the same embedder as the other repositories, "
+                    f"or drop the index by hand"
+                )
+        session.run(
+            f"CREATE VECTOR INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.embedding) "
+            f"OPTIONS {{indexConfig: {{`vector.dimensions`: {int(dimensions)}, "
+            f"`vector.similarity_function`: 'cosine'}}}}"
+        ).consume()
+        session.run("CALL db.awaitIndexes($timeout)", timeout=timeout).consume()
+    return name
+
+
+def index_usage(driver):
+    """Return ``{index name: read count}`` for every index in the database."""
+    with driver.session() as session:
+        records = session.run(
+            "SHOW INDEXES YIELD name, labelsOrTypes, properties, readCount "
+            "RETURN name, labelsOrTypes, properties, readCount"
+        ).data()
+    return {
+        record["name"]: {
+            "labels": record["labelsOrTypes"],
+            "properties": record["properties"],
+            "read_count": record["readCount"] or 0,
+        }
+        for record in records
+    }
+
+
+def index_usage_report(before, after):
+    """Diff two ``index_usage`` snapshots into per-index read counts for a build."""
+    report = {}
+    for name, usage in after.items():
+        reads = usage["read_count"] - before.get(name, {}).get("read_count", 0)
+        report[name] = {
+            "labels": usage["labels"],
+            "properties": usage["properties"],
+            "reads": reads,
+            "used": reads > 0,
+        }
+    return report
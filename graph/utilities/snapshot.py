@@ -0,0 +1,267 @@
+import glob
+import json
+import os
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .admin_import import RELATIONSHIP_FILES, CALL_PHASES, FILE_TYPE_LABELS
+from .bulk_loader import _run_batch
+from .build_report import summary_counters
+from . import schema
+
+# Portable snapshots of one repository's graph: a directory with one parquet
+# file per node label and per relationship pattern, plus ``manifest.json``.
+# Node files hold the node properties as typed columns and ``_labels`` (the
+# labels besides the primary one, e.g. ``Markdown`` on a ``File``); edge
+# files hold ``_src``/``_dst`` (the endpoints' key properties) and the
+# relationship properties. ``repo`` is not stored: a snapshot is restored
+# under whatever repository key the restoring build uses. The manifest is
+# written last, so a directory without one is an incomplete export.
+
+SNAPSHOT_FORMAT = 1
+MANIFEST = "manifest.json"
+
+# Relationship patterns of the graph model: (type, start label, end label).
+EDGE_TYPES = sorted(
+    {(rel_type, start, end) for _, rel_type, start, _, end, _ in RELATIONSHIP_FILES.values()}
+    | {("CALLS", caller, callee) for caller, callee in CALL_PHASES.values()}
+)
+
+LABEL_FILE_TYPES = {label: file_type for file_type, label in FILE_TYPE_LABELS.items()}
+
+
+def node_file(label):
+    return f"nodes_{label.lower()}.parquet"
+
+
+def edge_file(rel_type, start, end):
+    return f"edges_{rel_type.lower()}_{start.lower()}_{end.lower()}.parquet"
+
+
+def _plain(value):
+    # Neo4j temporal values (``RepoSummary.updated_at``) become datetime objects.
+    return value.to_native() if hasattr(value, "to_native") else value
+
+
+def _conform(batch, schema_):
+    columns = [
+        batch.column(field.name).cast(field.type) if field.name in batch.schema.names
+        else pa.nulls(batch.num_rows, field.type)
+        for field in schema_
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=schema_)
+
+
+def _write_table(path, rows, batch_size, types=None):
+    """Write dict ``rows`` to a parquet file and return the row count.
+
+    Column types are inferred per batch and unified across all of them
+    (a column that is null in one batch and a string in another is a
+    string column), so a property missing from some nodes is a null.
+    ``types`` fixes the type of columns that may be all null or empty.
+    """
+    batches = []
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= batch_size:
+            batches.append(pa.RecordBatch.from_pylist(buffer))
+            buffer = []
+    if buffer:
+        batches.append(pa.RecordBatch.from_pylist(buffer))
+    if not batches:
+        return 0
+    unified = pa.unify_schemas([batch.schema for batch in batches], promote_options="permissive")
+    unified = pa.schema([pa.field(field.name, (types or {}).get(field.name, field.type)) for field in unified])
+    with pq.ParquetWriter(path, unified, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(_conform(batch, unified))
+    return sum(batch.num_rows for batch in batches)
+
+
+def write_snapshot(directory, repo, nodes, edges, batch_size=1000, **metadata):
+    """Write a snapshot of ``repo`` to ``directory`` and return its manifest.
+
+    ``nodes`` maps each label to an iterable of ``(properties, extra
+    labels)``; ``edges`` maps each ``EDGE_TYPES`` pattern to an iterable of
+    ``(start key, end key, properties)``. Both are consumed lazily, one
+    table at a time. Files of an earlier snapshot in ``directory`` are
+    replaced.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in [os.path.join(directory, MANIFEST)] + glob.glob(os.path.join(directory, "*.parquet")):
+        if os.path.exists(path):
+            os.remove(path)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "repo": repo,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **metadata,
+        "nodes": {},
+        "edges": [],
+        "embeddings": {},
+    }
+    for label, records in nodes.items():
+        dimensions = {}
+
+        def node_rows():
+            for props, labels in records:
+                row = {name: _plain(value) for name, value in props.items() if name != "repo"}
+                if row.get("embedding") and label not in dimensions:
+                    dimensions[label] = len(row["embedding"])
+                row["_labels"] = sorted(labels)
+                yield row
+
+        count = _write_table(os.path.join(directory, node_file(label)), node_rows(), batch_size,
+                             types={"_labels": pa.list_(pa.string())})
+        manifest["nodes"][label] = count
+        manifest["embeddings"].update(dimensions)
+    for (rel_type, start, end), records in edges.items():
+        rows = (
+            {"_src": src, "_dst": dst, **{name: _plain(value) for name, value in props.items() if name != "repo"}}
+            for src, dst, props in records
+        )
+        count = _write_table(os.path.join(directory, edge_file(rel_type, start, end)), rows, batch_size)
+        manifest["edges"].append({"type": rel_type, "start": start, "end": end, "rows": count})
+
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    """Load and validate the manifest of the snapshot in ``directory``.
+
+    Raises ValueError for an incomplete export, another snapshot format or
+    labels and relationship patterns outside the graph model (names from
+    the manifest end up in Cypher).
+    """
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise ValueError(f"No snapshot in {directory}: {MANIFEST} is missing")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')!r} in {directory}")
+    unknown = [label for label in manifest["nodes"] if label not in schema.NODE_KEYS]
+    unknown += [
+        f"{edge['type']}({edge['start']}->{edge['end']})" for edge in manifest["edges"]
+        if (edge["type"], edge["start"], edge["end"]) not in EDGE_TYPES
+    ]
+    if unknown:
+        raise ValueError(f"Snapshot in {directory} has labels or relationships outside the graph model: {unknown}")
+    return manifest
+
+
+def _read_rows(path, batch_size):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield [{name: value for name, value in row.items() if value is not None} for row in batch.to_pylist()]
+
+
+def iter_nodes(directory, manifest, batch_size=1000):
+    """Yield ``(label, rows)`` batches; rows are properties plus ``_labels``, without nulls."""
+    for label, count in manifest["nodes"].items():
+        if count:
+            for rows in _read_rows(os.path.join(directory, node_file(label)), batch_size):
+                for row in rows:
+                    extra = set(row.get("_labels", ())) - set(LABEL_FILE_TYPES)
+                    if extra:
+                        raise ValueError(f"Snapshot {label} node has unknown labels: {sorted(extra)}")
+                yield label, rows
+
+
+def iter_edges(directory, manifest, batch_size=1000):
+    """Yield ``((type, start, end), rows)`` batches; rows are ``_src``, ``_dst`` and the properties."""
+    for edge in manifest["edges"]:
+        if edge["rows"]:
+            pattern = (edge["type"], edge["start"], edge["end"])
+            for rows in _read_rows(os.path.join(directory, edge_file(*pattern)), batch_size):
+                yield pattern, rows
+
+
+# Neo4j
+
+def _neo4j_nodes(session, repo, label):
+    key = schema.NODE_KEYS[label]
+    result = session.run(
+        schema.repo_scan(label) + f" RETURN properties(n) AS props, "
+        f"[l IN labels(n) WHERE l <> $label] AS labels ORDER BY n.{key}",
+        repo=repo, label=label
+    )
+    for record in result:
+        yield record["props"], record["labels"]
+
+
+def _neo4j_edges(session, repo, rel_type, start, end):
+    result = session.run(
+        schema.repo_scan(start, "a") + f" MATCH (a)-[r:{rel_type}]->(b:{end}) "
+        f"RETURN a.{schema.NODE_KEYS[start]} AS src, b.{schema.NODE_KEYS[end]} AS dst, properties(r) AS props",
+        repo=repo
+    )
+    for record in result:
+        yield record["src"], record["dst"], record["props"]
+
+
+def export_neo4j(driver, directory, repo, batch_size=1000, **metadata):
+    """Snapshot repository ``repo`` of a Neo4j database; each table is one streamed query."""
+    with driver.session() as session:
+        return write_snapshot(
+            directory, repo,
+            {label: _neo4j_nodes(session, repo, label) for label in schema.NODE_KEYS},
+            {pattern: _neo4j_edges(session, repo, *pattern) for pattern in EDGE_TYPES},
+            batch_size=batch_size, source="neo4j", **metadata,
+        )
+
+
+def node_create_query(label, extra_labels=()):
+    key = schema.NODE_KEYS[label]
+    identity = "repo: $repo" if key == "repo" else f"repo: $repo, {key}: row.{key}"
+    set_labels = "".join(f" SET n:{extra}" for extra in extra_labels)
+    return f"UNWIND $rows AS row CREATE (n:{label} {{{identity}}}) SET n += row{set_labels}"
+
+
+def edge_create_query(rel_type, start, end):
+    return (
+        f"UNWIND $rows AS row "
+        f"MATCH (a:{start} {{repo: $repo, {schema.NODE_KEYS[start]}: row.src}}) "
+        f"MATCH (b:{end} {{repo: $repo, {schema.NODE_KEYS[end]}: row.dst}}) "
+        f"CREATE (a)-[r:{rel_type} {{repo: $repo}}]->(b) SET r += row.props"
+    )
+
+
+def import_neo4j(driver, directory, repo, batch_size=1000):
+    """Load a snapshot into repository ``repo``, which must be empty.
+
+    Nodes and relationships are CREATEd with one UNWIND statement per batch,
+    each in its own transaction; the uniqueness constraints make a restore
+    into a non-empty repository fail rather than duplicate nodes. Vector
+    indexes for embedded labels are created once the nodes are in.
+    Returns the manifest and the summed query counters.
+    """
+    manifest = read_manifest(directory)
+    totals = {}
+
+    def write(query, rows):
+        summary = session.execute_write(_run_batch, query, rows, repo)
+        for name, value in summary_counters(summary).items():
+            totals[name] = totals.get(name, 0) + value
+
+    with driver.session() as session:
+        for label, rows in iter_nodes(directory, manifest, batch_size):
+            groups = {}
+            for row in rows:
+                extra = tuple(row.pop("_labels", ()))
+                if label == "RepoSummary":
+                    row["id"] = repo
+                groups.setdefault(extra, []).append(row)
+            for extra, group in groups.items():
+                write(node_create_query(label, extra), group)
+        for pattern, rows in iter_edges(directory, manifest, batch_size):
+            write(edge_create_query(*pattern), [
+                {"src": row.pop("_src"), "dst": row.pop("_dst"), "props": row} for row in rows
+            ])
+    for label, dimensions in manifest["embeddings"].items():
+        if label in schema.VECTOR_INDEXES:
+            schema.ensure_vector_index(driver, label, dimensions)
+    return manifest, totals
@@ -0,0 +1,407 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from .admin_import import RELATIONSHIP_FILES, CALL_PHASES, FILE_TYPE_LABELS
+from .build_report import BuildReport
+from .graph_rows import GraphRowCollector
+from .record_stream import load_records
+from .schema import NODE_KEYS
+from .text_splitter import DocumentChunker
+from . import centrality, snapshot
+
+logger = logging.getLogger(__name__)
+
+# Node phases -> (label, id column).
+NODE_LABELS = {
+    "folders": ("Folder", "path"),
+    "files": ("File", "path"),
+    "chunk_contents": ("ChunkContent", "hash"),
+    "chunks": ("Chunk", "id"),
+    "classes": ("Class", "key"),
+    "methods": ("Method", "key"),
+    "functions": ("Function", "key"),
+}
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS nodes (label TEXT NOT NULL, id TEXT NOT NULL, props TEXT NOT NULL, "
+    "PRIMARY KEY (label, id))",
+    "CREATE TABLE IF NOT EXISTS edges (type TEXT NOT NULL, src_label TEXT NOT NULL, src TEXT NOT NULL, "
+    "dst_label TEXT NOT NULL, dst TEXT NOT NULL, props TEXT NOT NULL DEFAULT '{}', "
+    "PRIMARY KEY (type, src_label, src, dst_label, dst))",
+    "CREATE INDEX IF NOT EXISTS edges_by_dst ON edges (dst_label, dst, type)",
+    "CREATE INDEX IF NOT EXISTS nodes_by_name ON nodes (label, json_extract(props, '$.name'))",
+]
+
+NODE_UPSERT = (
+    "INSERT INTO nodes (label, id, props) VALUES (?, ?, ?) "
+    "ON CONFLICT (label, id) DO UPDATE SET props = json_patch(nodes.props, excluded.props)"
+)
+EDGE_UPSERT = (
+    "INSERT INTO edges (type, src_label, src, dst_label, dst, props) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (type, src_label, src, dst_label, dst) DO UPDATE SET props = excluded.props"
+)
+
+# Relationships whose endpoint was never created are dropped, as an
+# unmatched MATCH drops them in the Cypher loader.
+DANGLING_EDGES_DELETE = (
+    "DELETE FROM edges WHERE NOT EXISTS (SELECT 1 FROM nodes n WHERE n.label = edges.src_label AND n.id = edges.src) "
+    "OR NOT EXISTS (SELECT 1 FROM nodes n WHERE n.label = edges.dst_label AND n.id = edges.dst)"
+)
+
+
+class SQLiteCodeGraph(GraphRowCollector):
+    """In-process code graph stored in a single SQLite file, no Neo4j server needed.
+
+    Ingests the same parser records through the same ``(phase, row)`` rows
+    as ``CodeGraph`` into generic ``nodes``/``edges`` tables (labels,
+    relationship types and properties as in Neo4j), and answers the
+    structural queries the AI layer asks: folder tree, definitions, calls,
+    imports, chunks of a file and symbol lookup.
+    """
+
+    def __init__(self, db_path, json_file=None, batch_size=1000, data=None, report=None, body_store=None,
+                 repo="default", reach_hops=3):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        # The file is a rebuildable artifact; trade durability for load speed.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.data = data if data is not None else load_records(json_file) if json_file else []
+        super().__init__(DocumentChunker(chunk_size=800, chunk_overlap=100, count_tokens=True), body_store=body_store)
+        self.batch_size = batch_size
+        # The file holds a single repository; the key is only recorded in snapshots.
+        self.repo = repo
+        self.reach_hops = reach_hops
+        self.report = report or BuildReport(backend="sqlite", batch_size=batch_size)
+        self.ensure_schema()
+
+    def close(self):
+        self.connection.close()
+
+    def ensure_schema(self):
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def has_files(self):
+        """Whether the file already holds a graph (any ``File`` node)."""
+        return self.connection.execute("SELECT 1 FROM nodes WHERE label = 'File' LIMIT 1").fetchone() is not None
+
+    def clear_graph(self):
+        with self.report.step("clear"):
+            self.connection.execute("DELETE FROM edges")
+            self.connection.execute("DELETE FROM nodes")
+            self.connection.commit()
+
+    def build_graph(self, bulk=True, incremental=False):
+        """Load every file record; ``bulk`` is accepted for interface parity with ``CodeGraph``."""
+        if incremental:
+            raise ValueError("Incremental builds need the Neo4j backend; rebuild the SQLite graph instead")
+        print(f"Starting to build embedded graph in {self.db_path}...")
+        report = self.report
+        report.settings.update(backend="sqlite")
+        buffers = defaultdict(list)
+        self.unresolved_calls = 0
+        self.duplicate_definitions = 0
+        self.chunk_contents = set()
+        seen_folders = set()
+        processed_count = 0
+        chunk_count_total = 0
+        start = time.perf_counter()
+
+        for file_obj in self.data:
+            if file_obj.get('type') == 'stats':
+                report.set_section("parse", {k: v for k, v in file_obj.items() if k != 'type'})
+                continue
+            file_path = file_obj.get('file')
+            if not file_path:
+                continue
+            if file_obj.get('type') != 'calls':
+                processed_count += 1
+            try:
+                rows, chunk_count = self._collect_file_rows(file_obj, seen_folders)
+            except Exception as e:
+                logger.error("Error processing file %s: %s", file_path, e)
+                report.count("file_errors")
+                continue
+            chunk_count_total += chunk_count
+            for phase, row in rows:
+                buffer = buffers[phase]
+                buffer.append(row)
+                if len(buffer) >= self.batch_size:
+                    self._write(phase, buffer)
+                    buffers[phase] = []
+
+        for phase, rows in buffers.items():
+            if rows:
+                self._write(phase, rows)
+        if self.body_store is not None:
+            self.body_store.flush()
+        dropped = self.connection.execute(DANGLING_EDGES_DELETE).rowcount
+        self.connection.commit()
+        elapsed = time.perf_counter() - start
+        report.steps["load"] = report.steps.get("load", 0.0) + elapsed
+
+        report.count("files_processed", processed_count)
+        report.count("chunks_created", chunk_count_total)
+        report.count("chunk_contents_created", len(self.chunk_contents))
+        report.count("unresolved_calls", self.unresolved_calls)
+        report.count("duplicate_definitions", self.duplicate_definitions)
+        if self.duplicate_definitions:
+            logger.warning("%d definitions were replaced by a same-named one in the same file",
+                           self.duplicate_definitions)
+        report.count("dangling_edges_dropped", dropped)
+        nodes, edges = self.connection.execute(
+            "SELECT (SELECT count(*) FROM nodes), (SELECT count(*) FROM edges)"
+        ).fetchone()
+        print(f"Embedded graph build summary:")
+        print(f"  Total files processed: {processed_count}")
+        print(f"  Nodes: {nodes}, relationships: {edges} ({dropped} dangling dropped)")
+        print(f"  Built in {elapsed:.2f}s")
+        self.compute_centrality()
+
+    def compute_centrality(self):
+        """Store call and import graph scores on methods, functions and files (see ``centrality``)."""
+        results = {}
+        with self.report.step("centrality"):
+            nodes = [(row["label"], row["id"]) for row in self.connection.execute(
+                "SELECT label, id FROM nodes WHERE label IN ('Method', 'Function') ORDER BY label, id"
+            )]
+            edges = [((row["src_label"], row["src"]), (row["dst_label"], row["dst"])) for row in self.connection.execute(
+                "SELECT src_label, src, dst_label, dst FROM edges WHERE type = 'CALLS'"
+            )]
+            metrics, results["calls"] = centrality.graph_metrics(nodes, edges, self.reach_hops)
+            updates = [
+                (json.dumps(props), label, node_id)
+                for (label, node_id), props in centrality.metric_rows(nodes, metrics, centrality.CALL_PROPERTIES).items()
+            ]
+
+            nodes = [row["id"] for row in self.connection.execute("SELECT id FROM nodes WHERE label = 'File' ORDER BY id")]
+            edges = [(row["src"], row["dst"]) for row in self.connection.execute(
+                "SELECT src, dst FROM edges WHERE type = 'IMPORTS' AND src_label = 'File' AND dst_label = 'File'"
+            )]
+            metrics, results["imports"] = centrality.graph_metrics(nodes, edges, self.reach_hops)
+            updates += [
+                (json.dumps(props), "File", path)
+                for path, props in centrality.metric_rows(nodes, metrics, centrality.IMPORT_PROPERTIES).items()
+            ]
+            self.connection.executemany("UPDATE nodes SET props = json_patch(props, ?) WHERE label = ? AND id = ?",
+                                        updates)
+            self.connection.commit()
+        results["hops"] = self.reach_hops
+        self.report.set_section("centrality", results)
+        print(f"Centrality computed: {results['calls']['nodes']} methods/functions ({results['calls']['edges']} calls), "
+              f"{results['imports']['nodes']} files ({results['imports']['edges']} imports), "
+              f"reach within {self.reach_hops} hops")
+
+    def _write(self, phase, rows):
+        start = time.perf_counter()
+        if phase in NODE_LABELS:
+            label, id_column = NODE_LABELS[phase]
+            self.connection.executemany(NODE_UPSERT, (
+                (label, row[id_column], json.dumps(row)) for row in rows
+            ))
+        elif phase == "file_hashes":
+            self.connection.executemany(NODE_UPSERT, (
+                ("File", row["path"], json.dumps({"content_hash": row["content_hash"]})) for row in rows
+            ))
+        elif phase in CALL_PHASES:
+            caller_label, callee_label = CALL_PHASES[phase]
+            self.connection.executemany(EDGE_UPSERT, (
+                ("CALLS", caller_label, row["caller_key"], callee_label, row["callee_key"], json.dumps({
+                    "caller_function": row["caller"],
+                    **({"caller_class": row.get("caller_class")} if caller_label == "Method" else {}),
+                    "called_function": row["called"],
+                }))
+                for row in rows
+            ))
+        elif phase in RELATIONSHIP_FILES:
+            _, rel_type, start_label, start_column, end_label, end_column = RELATIONSHIP_FILES[phase]
+            if phase == "file_uses_library":
+                self.connection.executemany(NODE_UPSERT, (
+                    ("Library", row["module"], json.dumps({"name": row["module"]})) for row in rows
+                ))
+            self.connection.executemany(EDGE_UPSERT, (
+                (rel_type, start_label, row[start_column], end_label, row[end_column], "{}") for row in rows
+            ))
+        self.connection.commit()
+        stat = self.report.loader_stats.setdefault(phase, {"rows": 0, "batches": 0, "seconds": 0.0})
+        stat["rows"] += len(rows)
+        stat["batches"] += 1
+        stat["seconds"] += time.perf_counter() - start
+
+    # Snapshots
+
+    def export_snapshot(self, directory):
+        """Write the graph to ``directory`` as a columnar snapshot (see ``snapshot``)."""
+        with self.report.step("export_snapshot"):
+            manifest = snapshot.write_snapshot(
+                directory, self.repo,
+                {label: self._snapshot_nodes(label) for label in NODE_KEYS},
+                {pattern: self._snapshot_edges(*pattern) for pattern in snapshot.EDGE_TYPES},
+                batch_size=self.batch_size, source="sqlite", external_bodies=self.body_store is not None,
+            )
+        self.report.set_section("snapshot_export", {"directory": directory, "nodes": manifest["nodes"]})
+        print(f"Snapshot written to {directory}: {sum(manifest['nodes'].values())} nodes, "
+              f"{sum(edge['rows'] for edge in manifest['edges'])} relationships")
+        return manifest
+
+    def _snapshot_nodes(self, label):
+        for row in self.connection.execute("SELECT props FROM nodes WHERE label = ? ORDER BY id", (label,)):
+            props = json.loads(row["props"])
+            # Neo4j marks documentation files with a label instead of the ``type`` property.
+            labels = [FILE_TYPE_LABELS[props["type"]]] if label == "File" and props.get("type") in FILE_TYPE_LABELS else []
+            yield props, labels
+
+    def _snapshot_edges(self, rel_type, start, end):
+        for row in self.connection.execute(
+            "SELECT src, dst, props FROM edges WHERE type = ? AND src_label = ? AND dst_label = ? ORDER BY src, dst",
+            (rel_type, start, end)
+        ):
+            yield row["src"], row["dst"], json.loads(row["props"])
+
+    def restore_snapshot(self, directory):
+        """Replace the graph with the snapshot in ``directory``, from either backend."""
+        manifest = snapshot.read_manifest(directory)
+        if manifest.get("external_bodies") and self.body_store is None:
+            logger.warning("Snapshot %s keeps bodies in a body store; configure it to read chunk and code text",
+                           directory)
+        self.clear_graph()
+        start = time.perf_counter()
+        nodes = edges = 0
+        with self.report.step("restore_snapshot"):
+            for label, rows in snapshot.iter_nodes(directory, manifest, self.batch_size):
+                key = NODE_KEYS[label]
+                values = []
+                for row in rows:
+                    labels = row.pop("_labels", [])
+                    if labels and "type" not in row:
+                        row["type"] = snapshot.LABEL_FILE_TYPES[labels[0]]
+                    node_id = self.repo if key == "repo" else row[key]
+                    values.append((label, node_id, json.dumps(row, default=str)))
+                self.connection.executemany(NODE_UPSERT, values)
+                nodes += len(values)
+            for (rel_type, start_label, end_label), rows in snapshot.iter_edges(directory, manifest, self.batch_size):
+                self.connection.executemany(EDGE_UPSERT, (
+                    (rel_type, start_label, row.pop("_src"), end_label, row.pop("_dst"), json.dumps(row, default=str))
+                    for row in rows
+                ))
+                edges += len(rows)
+            self.connection.commit()
+        self.report.count("snapshot_nodes", nodes)
+        self.report.count("snapshot_relationships", edges)
+        print(f"Restored snapshot {directory} ({manifest['source']}, repository {manifest['repo']}): "
+              f"{nodes} nodes, {edges} relationships in {time.perf_counter() - start:.2f}s")
+        return manifest
+
+    # Structural queries
+
+    def _node(self, row):
+        props = json.loads(row["props"])
+        props["label"] = row["label"]
+        return props
+
+    def node(self, label, node_id):
+        row = self.connection.execute(
+            "SELECT label, props FROM nodes WHERE label = ? AND id = ?", (label, node_id)
+        ).fetchone()
+        return self._node(row) if row else None
+
+    def folder_tree(self):
+        """``{folder path: [child folder and file paths]}`` for the whole repository."""
+        tree = defaultdict(list)
+        for row in self.connection.execute(
+            "SELECT src, dst FROM edges WHERE type = 'CONTAINS' AND src_label = 'Folder' ORDER BY src, dst"
+        ):
+            tree[row["src"]].append(row["dst"])
+        return dict(tree)
+
+    def folder_contents(self, path):
+        """Folders and files directly inside ``path``."""
+        return [
+            {"label": row["dst_label"], "path": row["dst"]}
+            for row in self.connection.execute(
+                "SELECT dst_label, dst FROM edges WHERE type = 'CONTAINS' AND src_label = 'Folder' AND src = ? "
+                "ORDER BY dst_label, dst", (path,)
+            )
+        ]
+
+    def definitions(self, file_path):
+        """Classes (with their methods) and functions defined in ``file_path``."""
+        classes = []
+        functions = []
+        for row in self.connection.execute(
+            "SELECT n.label, n.props FROM edges e JOIN nodes n ON n.label = e.dst_label AND n.id = e.dst "
+            "WHERE e.type = 'DEFINES' AND e.src_label = 'File' AND e.src = ? "
+            "ORDER BY json_extract(n.props, '$.lineno')", (file_path,)
+        ):
+            node = self._node(row)
+            if row["label"] == "Class":
+                node["methods"] = [
+                    self._node(method) for method in self.connection.execute(
+                        "SELECT n.label, n.props FROM edges e JOIN nodes n ON n.label = e.dst_label AND n.id = e.dst "
+                        "WHERE e.type = 'DEFINES' AND e.src_label = 'Class' AND e.src = ? "
+                        "ORDER BY json_extract(n.props, '$.lineno')", (node["key"],)
+                    )
+                ]
+                classes.append(node)
+            else:
+                functions.append(node)
+        return {"classes": classes, "functions": functions}
+
+    def calls(self, key, direction="out"):
+        """Callees (``direction="out"``) or callers (``"in"``) of the method/function ``key``."""
+        if direction == "out":
+            query = ("SELECT n.label, n.props FROM edges e JOIN nodes n ON n.label = e.dst_label AND n.id = e.dst "
+                     "WHERE e.type = 'CALLS' AND e.src = ? ORDER BY n.id")
+        else:
+            query = ("SELECT n.label, n.props FROM edges e JOIN nodes n ON n.label = e.src_label AND n.id = e.src "
+                     "WHERE e.type = 'CALLS' AND e.dst = ? ORDER BY n.id")
+        return [self._node(row) for row in self.connection.execute(query, (key,))]
+
+    def imports(self, file_path, direction="out"):
+        """Repository files ``file_path`` imports (``direction="out"``) or that import it (``"in"``)."""
+        if direction == "out":
+            query = ("SELECT dst AS path FROM edges WHERE type = 'IMPORTS' AND src_label = 'File' AND src = ? "
+                     "ORDER BY dst")
+        else:
+            query = ("SELECT src AS path FROM edges WHERE type = 'IMPORTS' AND dst_label = 'File' AND dst = ? "
+                     "ORDER BY src")
+        return [row["path"] for row in self.connection.execute(query, (file_path,))]
+
+    def chunks(self, file_path):
+        """Chunks of ``file_path`` in document order with the properties of their
+        ``ChunkContent`` (text and counts), bodies resolved from the body store."""
+        chunks = [
+            {**json.loads(row["text"] or "{}"), **self._node(row)} for row in self.connection.execute(
+                "SELECT n.label, n.props, t.props AS text FROM edges e "
+                "JOIN nodes n ON n.label = e.dst_label AND n.id = e.dst "
+                "LEFT JOIN edges h ON h.type = 'HAS_CONTENT' AND h.src_label = 'Chunk' AND h.src = n.id "
+                "LEFT JOIN nodes t ON t.label = h.dst_label AND t.id = h.dst "
+                "WHERE e.type = 'CONTAINS' AND e.src_label = 'File' AND e.src = ? AND e.dst_label = 'Chunk' "
+                "ORDER BY json_extract(n.props, '$.chunk_index')", (file_path,)
+            )
+        ]
+        if self.body_store is not None:
+            bodies = self.body_store.get_many(c["body_hash"] for c in chunks if c.get("body_hash"))
+            for chunk in chunks:
+                if chunk.get("content") is None and chunk.get("body_hash"):
+                    chunk["content"] = bodies.get(chunk["body_hash"])
+        return chunks
+
+    def find_symbols(self, name, labels=("Class", "Method", "Function")):
+        """Classes, methods and functions called ``name``."""
+        placeholders = ",".join("?" * len(labels))
+        return [
+            self._node(row) for row in self.connection.execute(
+                f"SELECT label, props FROM nodes WHERE label IN ({placeholders}) "
+                f"AND json_extract(props, '$.name') = ? ORDER BY id", (*labels, name)
+            )
+        ]
@@ -1,40 +1,145 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
+import re
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+# Rough BPE-style token estimate: words, numbers and single punctuation marks.
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, dependency-free token estimate used when no tokenizer is supplied"""
+    return len(_TOKEN_PATTERN.findall(text))
 
 
 class DocumentChunker:
-    """Minimal text splitter using langchain for chunking documents before Neo4j upload"""
-    
-    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100):
-        """Initialize with langchain text splitter"""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-    
+    """Recursive character splitter that keeps source offsets.
+
+    Uses the same separators, size and overlap rules as LangChain's
+    ``RecursiveCharacterTextSplitter`` (separators kept at the start of the
+    following piece, chunks whitespace-stripped), but works on (start, end)
+    spans of the original text, so no intermediate strings are built and
+    every chunk can be re-read from its source file.
+    """
+
+    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100,
+                 separators: Optional[List[str]] = None,
+                 count_tokens: Union[bool, Callable[[str], int]] = False):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        if count_tokens is True:
+            count_tokens = estimate_tokens
+        self.token_counter = count_tokens or None
+
+    def iter_chunks(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(start, end, chunk_text)`` with ``text[start:end] == chunk_text``"""
+        for start, end in self._split(text, 0, len(text), self.separators):
+            yield start, end, text[start:end]
+
     def split_text(self, text: str) -> List[str]:
-        """Split text into chunks using langchain splitter"""
-        return self.text_splitter.split_text(text)
-    
-    def create_chunk_metadata(self, file_path: str, chunks: List[str]) -> List[dict]:
-        """Create chunk metadata for Neo4j nodes"""
+        """Split text into chunks"""
+        return [chunk for _, _, chunk in self.iter_chunks(text)]
+
+    def _split(self, text, start, end, separators):
+        separator = separators[-1]
+        remaining = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        good = []
+        for piece in self._pieces(text, start, end, separator):
+            if piece[1] - piece[0] < self.chunk_size:
+                good.append(piece)
+                continue
+            if good:
+                yield from self._merge(text, good)
+                good = []
+            if remaining:
+                yield from self._split(text, piece[0], piece[1], remaining)
+            else:
+                yield from self._strip(text, piece[0], piece[1])
+        if good:
+            yield from self._merge(text, good)
+
+    @staticmethod
+    def _pieces(text, start, end, separator):
+        """Spans between occurrences of ``separator``, each separator kept at the start of the next span"""
+        if separator == "":
+            for i in range(start, end):
+                yield i, i + 1
+            return
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                yield piece_start, position
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            yield piece_start, end
+
+    def _merge(self, text, pieces):
+        """Greedily join adjacent pieces up to ``chunk_size``, carrying up to ``chunk_overlap`` into the next chunk"""
+        current = []
+        total = 0
+        for piece in pieces:
+            length = piece[1] - piece[0]
+            if total + length > self.chunk_size and current:
+                yield from self._strip(text, current[0][0], current[-1][1])
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= current[0][1] - current[0][0]
+                    current.pop(0)
+            current.append(piece)
+            total += length
+        if current:
+            yield from self._strip(text, current[0][0], current[-1][1])
+
+    @staticmethod
+    def _strip(text, start, end):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            yield start, end
+
+    def create_chunk_metadata(self, file_path: str, chunks: List[Union[str, Tuple[int, int, str]]]) -> List[dict]:
+        """Create chunk metadata for Neo4j nodes.
+
+        ``chunks`` are the ``(start, end, text)`` triples of ``iter_chunks``
+        (plain strings are accepted and stored without offsets).
+        """
         chunk_data = []
-        for i, chunk_text in enumerate(chunks):
-            chunk_data.append({
+        for i, chunk in enumerate(chunks):
+            start, end, chunk_text = chunk if isinstance(chunk, tuple) else (None, None, chunk)
+            metadata = {
                 "id": f"{file_path}_chunk_{i}",
                 "content": chunk_text,
                 "chunk_index": i,
                 "total_chunks": len(chunks),
                 "source_file": file_path,
+                "start_offset": start,
+                "end_offset": end,
                 "char_count": len(chunk_text),
                 "word_count": len(chunk_text.split())
-            })
+            }
+            if self.token_counter:
+                metadata["token_count"] = self.token_counter(chunk_text)
+            chunk_data.append(metadata)
         return chunk_data
 
 
 def chunk_document(file_path: str, content: str, chunk_size: int = 800) -> List[dict]:
     """Convenience function to chunk a document and return metadata"""
     chunker = DocumentChunker(chunk_size=chunk_size)
-    chunks = chunker.split_text(content)
+    chunks = list(chunker.iter_chunks(content))
     return chunker.create_chunk_metadata(file_path, chunks)
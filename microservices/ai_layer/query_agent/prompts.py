@@ -1,7 +1,7 @@
 from langchain.prompts import PromptTemplate
 
 cypher_prompt = PromptTemplate(
-input_variables=["schema", "question"],
+input_variables=["schema", "question", "repo"],
 template="""
 Task: Generate a Cypher statement to query a graph database.
 
@@ -11,6 +11,7 @@ If the context of action is about specific code details, focus on nodes like Cla
 Don't specifically look for the section names in the nodes' content, as they might not be explicitly mentioned. Instead, infer them from the graph structure and relationships.
 Instructions:
 - Use only the provided relationship types and properties in the schema
+- The database holds several repositories: every node has a repo property and you must restrict every matched node to repo = '{repo}' (e.g. MATCH (f:File {{repo: '{repo}'}}) or WHERE n.repo = '{repo}'), including nodes returned by the full-text indexes
 - Use modern Neo4j syntax: for example "property IS NOT NULL" instead of "exists(property)"
 - Follow proper Cypher clause order: MATCH, WHERE, RETURN (never start with WHERE)
 - WHERE clauses must always follow MATCH clauses
@@ -20,6 +21,19 @@ Instructions:
 - If using UNION, ensure all parts return the same column names and types
 - Prefer simple MATCH patterns over complex unions when possible
 - Avoid UNION unless absolutely necessary for the query
+- To match words in content, names or paths, do not use CONTAINS; use the full-text indexes instead:
+  CALL db.index.fulltext.queryNodes('code_content' | 'chunk_text' | 'file_path', "words") YIELD node, score
+- For overviews (counts, sizes, lines of code, top libraries) do not aggregate over the graph; read the precomputed properties instead:
+  the (:RepoSummary {{repo: '{repo}'}}) node (folders, files, python_files, markdown_files, classes, methods, functions, chunks, unique_chunks, libraries, calls, imports, loc, top_libraries, top_library_uses, root_folders, largest_folders, reach_hops),
+  Folder nodes (total_files, file_count, subfolder_count, python_files, loc, class_count, method_count, function_count, top_libraries) and
+  File nodes (line_count, class_count, method_count, function_count, chunk_count, library_count, import_count, imported_by_count)
+- For the most important, central or widely used code (key components, architecture, entry points) do not explore CALLS or IMPORTS paths; ORDER BY the precomputed scores instead:
+  Method and Function nodes (call_pagerank, call_in_degree, call_out_degree, call_reach_in, call_reach_out) and
+  File nodes (import_pagerank, import_reach_in, import_reach_out), e.g. MATCH (f:Function {{repo: '{repo}'}}) RETURN f.key, f.call_pagerank ORDER BY f.call_pagerank DESC LIMIT 10;
+  pagerank averages 1.0, reach_in/reach_out count the callers/callees (importers/imported files) within RepoSummary.reach_hops steps; when RepoSummary.centrality_stale is true the scores date from the last full build and recently added code has none
+- For dependencies and architecture between modules traverse (:File)-[:IMPORTS]->(:File) (resolved imports of repository files) instead of reading file contents; third-party packages are (:File)-[:USES]->(:Library)
+- Document text is stored once per distinct chunk: (:File)-[:CONTAINS]->(:Chunk)-[:HAS_CONTENT]->(:ChunkContent); Chunk holds the position (source_id, chunk_index, offsets, FOLLOWS to the next chunk), ChunkContent the content and counts, and files sharing a text point at the same ChunkContent
+- Whenever you return the content of a ChunkContent, Method or Function, also return its body_hash (e.g. m.content, m.body_hash); the text may be stored outside the graph
 
 Schema:
 {schema}
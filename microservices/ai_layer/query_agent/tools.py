@@ -7,6 +7,8 @@ from langchain_core.output_parsers import StrOutputParser
 from query_agent.prompts import cypher_prompt
 from dotenv import load_dotenv
 from utilities.llm import llm
+from utilities.embeddings import get_embedder
+from utilities.body_store import BodyStore
 load_dotenv()
 
 graph = Neo4jGraph(
@@ -15,20 +17,167 @@ graph = Neo4jGraph(
     password=os.getenv("NEO4J_PASSWORD")
 )
 
+# Repository the agents answer about; the graph builder scoped every node and relationship by it (GRAPH_REPO).
+REPO = os.getenv("GRAPH_REPO", "default")
+
+# Bodies kept out of the graph by the builder's --body-store (GRAPH_BODY_STORE).
+BODY_STORE_PATH = os.getenv("GRAPH_BODY_STORE")
+body_store = BodyStore(BODY_STORE_PATH) if BODY_STORE_PATH and os.path.exists(BODY_STORE_PATH) else None
+
+
+def _body_slots(value, slots):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "body_hash" or key.endswith(".body_hash"):
+                if item:
+                    slots.append((value, key[:-len("body_hash")] + "content", item))
+            else:
+                _body_slots(item, slots)
+    elif isinstance(value, list):
+        for item in value:
+            _body_slots(item, slots)
+
+
+def resolve_bodies(rows):
+    """Fill in ``content`` (or ``x.content``) from the body store wherever a row only has the body hash."""
+    if body_store is None:
+        return rows
+    slots = []
+    _body_slots(rows, slots)
+    bodies = body_store.get_many(key for _, _, key in slots)
+    for row, content_key, key in slots:
+        if row.get(content_key) is None:
+            row[content_key] = bodies.get(key)
+    return rows
+
 
 def query_neo4j(question: str) -> str:
     try:
         schema = graph.schema
         chain = cypher_prompt | llm | StrOutputParser()
-        cypher = chain.invoke({"schema": schema, "question": question})
+        cypher = chain.invoke({"schema": schema, "question": question, "repo": REPO})
         cypher = cypher.strip().replace('```', '').replace('cypher', '')
-        result = graph.query(cypher)
+        result = resolve_bodies(graph.query(cypher))
         return str(result) if result else "No results found"
     except Exception:
         return "Query failed"
 
+# Must match the embedder the graph builder used (GRAPH_EMBEDDER); a graph
+# built with "none" has no vector indexes, so semantic search is disabled.
+EMBEDDER_NAME = os.getenv("GRAPH_EMBEDDER", "none")
+embedder = get_embedder(EMBEDDER_NAME) if EMBEDDER_NAME != "none" else None
+SEMANTIC_SEARCH_DISABLED = "Semantic search is disabled: the graph has no embeddings. Use SearchCode instead."
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "5"))
+# Vector indexes span every repository, so more neighbours are fetched than kept before filtering on REPO;
+# while other repositories crowd out the top k, the candidate count grows up to SIMILARITY_MAX_CANDIDATES.
+SIMILARITY_CANDIDATES = int(os.getenv("SIMILARITY_CANDIDATES", "100"))
+SIMILARITY_MAX_CANDIDATES = int(os.getenv("SIMILARITY_MAX_CANDIDATES", "10000"))
+VECTOR_INDEXES = ["chunk_content_embedding", "method_embedding", "function_embedding"]
+
+# Chunk text is stored once per distinct content (ChunkContent); a hit on it
+# names the first file containing it and lists the other ones in also_in.
+SIMILARITY_QUERY = """
+CALL db.index.vector.queryNodes($index, $candidates, $embedding) YIELD node, score
+WHERE node.repo = $repo
+OPTIONAL MATCH (chunk:Chunk)-[:HAS_CONTENT]->(node)
+WITH node, score, collect(DISTINCT chunk.source_id) AS sources
+RETURN coalesce(node.file, head(sources)) AS file,
+       sources[1..10] AS also_in,
+       coalesce(node.key, node.hash) AS id,
+       node.content AS content,
+       node.body_hash AS body_hash,
+       score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+
+def find_similar_code(question: str) -> str:
+    """Top-k chunks and code bodies closest to the question, without generating Cypher."""
+    if embedder is None:
+        return SEMANTIC_SEARCH_DISABLED
+    embedding = embedder.embed_query(question)
+    results = []
+    searched = 0
+    for index in VECTOR_INDEXES:
+        candidates = max(SIMILARITY_CANDIDATES, SIMILARITY_TOP_K)
+        try:
+            while True:
+                rows = graph.query(SIMILARITY_QUERY, params={
+                    "index": index, "k": SIMILARITY_TOP_K, "embedding": embedding, "repo": REPO,
+                    "candidates": candidates,
+                })
+                if len(rows) >= SIMILARITY_TOP_K or candidates >= SIMILARITY_MAX_CANDIDATES:
+                    break
+                candidates = min(candidates * 4, SIMILARITY_MAX_CANDIDATES)
+        except Exception:
+            # Code indexes only exist when the builder ran with --embed-code.
+            continue
+        results.extend(rows)
+        searched += 1
+    if not searched:
+        return SEMANTIC_SEARCH_DISABLED
+    results.sort(key=lambda row: row["score"], reverse=True)
+    results = resolve_bodies(results[:SIMILARITY_TOP_K])
+    for row in results:
+        row["content"] = (row["content"] or "")[:1000]
+    return str(results) if results else "No results found"
+
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "10"))
+# A graph built with --no-fulltext (required with a body store) has none of these indexes.
+FULLTEXT_INDEXES = ["code_content", "chunk_text", "file_path"]
+KEYWORD_SEARCH_DISABLED = "Keyword search is disabled: the graph has no full-text indexes. Use QueryNeo4j instead."
+LUCENE_SPECIAL = set('+-&|!(){}[]^"~*?:\\/')
+
+SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score
+WHERE node.repo = $repo
+OPTIONAL MATCH (chunk:Chunk)-[:HAS_CONTENT]->(node)
+WITH node, score, collect(DISTINCT chunk.source_id) AS sources
+RETURN labels(node) AS labels,
+       coalesce(node.key, node.hash, node.path) AS id,
+       coalesce(node.file, head(sources), node.path) AS file,
+       sources[1..10] AS also_in,
+       node.name AS name,
+       node.content AS content,
+       node.body_hash AS body_hash,
+       score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+
+def _lucene_escape(text: str) -> str:
+    return "".join("\\" + ch if ch in LUCENE_SPECIAL else ch for ch in text)
+
+
+def search_code(keywords: str) -> str:
+    """Ranked keyword search over code, chunks and file paths via the full-text indexes."""
+    # Lower-cased so AND/OR/NOT in the input are not read as operators.
+    query = _lucene_escape(keywords.strip().lower())
+    if not query:
+        return "No results found"
+    results = []
+    searched = 0
+    for index in FULLTEXT_INDEXES:
+        try:
+            results.extend(graph.query(SEARCH_QUERY, params={
+                "index": index, "query": query, "k": SEARCH_TOP_K, "repo": REPO
+            }))
+            searched += 1
+        except Exception:
+            continue
+    if not searched:
+        return KEYWORD_SEARCH_DISABLED
+    results.sort(key=lambda row: row["score"], reverse=True)
+    results = resolve_bodies(results[:SEARCH_TOP_K])
+    for row in results:
+        row["content"] = (row["content"] or "")[:500]
+    return str(results) if results else "No results found"
+
 def get_graph_schema(input_text=""):
-    return graph.schema
+    return (f"{graph.schema}\n\nThe graph holds several repositories. Every node and relationship has a "
+            f"repo property; the active repository is repo = '{REPO}'.")
 
 tools = [
     Tool(
@@ -36,6 +185,16 @@ tools = [
         func=query_neo4j,
         description="Query the Neo4j graph database"
     ),
+    Tool(
+        name="SearchCode",
+        func=search_code,
+        description="Keyword search over code, document chunks and file paths; input is the words or identifiers to look for"
+    ),
+    Tool(
+        name="FindSimilarCode",
+        func=find_similar_code,
+        description="Find the document chunks and code most similar to a natural-language question"
+    ),
     Tool(
         name="GetSchema",
         func=get_graph_schema,
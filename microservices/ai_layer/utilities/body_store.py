@@ -0,0 +1,78 @@
+# Shipped twice: graph/utilities is the original, microservices/ai_layer/utilities the copy
+# (tests/check_shared_code.py fails when they differ).
+import hashlib
+import os
+import sqlite3
+import zlib
+
+
+def body_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BodyStore:
+    """Content-addressed store for source bodies: sha256 -> zlib-compressed text in SQLite.
+
+    The graph keeps only ``body_hash``/``body_length`` on ChunkContent,
+    Method and Function nodes; readers resolve the text here when they need
+    it.
+    Identical bodies are stored once. Writes are buffered and committed in
+    batches of ``batch_size``.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS bodies (hash TEXT PRIMARY KEY, length INTEGER, data BLOB)"
+        )
+        self.pending = {}
+
+    def put(self, text):
+        """Queue ``text`` and return ``(hash, length)``."""
+        key = body_hash(text)
+        if key not in self.pending:
+            self.pending[key] = text
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+        return key, len(text)
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO bodies (hash, length, data) VALUES (?, ?, ?)",
+            ((key, len(text), zlib.compress(text.encode("utf-8"))) for key, text in self.pending.items())
+        )
+        self.connection.commit()
+        self.pending = {}
+
+    def get(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        row = self.connection.execute("SELECT data FROM bodies WHERE hash = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def get_many(self, keys):
+        """Return ``{hash: text}`` for the keys that are present."""
+        keys = list(set(keys))
+        found = {key: self.pending[key] for key in keys if key in self.pending}
+        missing = [key for key in keys if key not in found]
+        # Stay below SQLite's bound-parameter limit.
+        for i in range(0, len(missing), 500):
+            batch = missing[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for key, data in self.connection.execute(
+                f"SELECT hash, data FROM bodies WHERE hash IN ({placeholders})", batch
+            ):
+                found[key] = zlib.decompress(data).decode("utf-8")
+        return found
+
+    def close(self):
+        self.flush()
+        self.connection.close()
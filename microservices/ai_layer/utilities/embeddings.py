@@ -0,0 +1,100 @@
+# Shipped twice: graph/utilities is the original, microservices/ai_layer/utilities the copy
+# (tests/check_shared_code.py fails when they differ).
+import hashlib
+import math
+import os
+import re
+
+# Identifiers plus their camelCase / snake_case parts, so ``parseParquetToJson``
+# and ``parse_parquet_to_json`` share most of their features.
+_TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_WORD_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def _tokens(text):
+    for match in _TOKEN.finditer(text or ""):
+        word = match.group()
+        yield word.lower()
+        parts = [part.lower() for piece in word.split("_") for part in _WORD_PART.findall(piece)]
+        if len(parts) > 1:
+            yield from parts
+
+
+class HashingEmbedder:
+    """Deterministic, dependency-free embedder based on signed feature hashing.
+
+    Every token (and each camelCase / snake_case part of an identifier) is
+    hashed with blake2b into one of ``dimensions`` buckets with a +/-1 sign;
+    counts are log-scaled and the vector is L2-normalised, so cosine
+    similarity measures shared vocabulary. The same text always produces the
+    same vector on every machine, which keeps the builder and the AI layer in
+    agreement without any network access.
+    """
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed_query(self, text):
+        counts = {}
+        for token in _tokens(text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            index = value % self.dimensions
+            sign = 1.0 if (value >> 63) & 1 else -1.0
+            counts[index] = counts.get(index, 0.0) + sign
+
+        vector = [0.0] * self.dimensions
+        for index, count in counts.items():
+            vector[index] = math.copysign(1.0 + math.log(abs(count)), count) if count else 0.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class AzureOpenAIEmbedder:
+    """Embeddings from an Azure OpenAI deployment (needs ``langchain-openai`` and network access)."""
+
+    def __init__(self, deployment=None):
+        try:
+            from langchain_openai import AzureOpenAIEmbeddings
+        except ImportError as e:
+            raise ImportError("The 'azure' embedder requires the langchain-openai package") from e
+        deployment = deployment or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+        self.client = AzureOpenAIEmbeddings(
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_deployment=deployment,
+        )
+        self.name = f"azure-{deployment}"
+        self.dimensions = None
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        vectors = self.client.embed_documents(list(texts))
+        if vectors and self.dimensions is None:
+            self.dimensions = len(vectors[0])
+        return vectors
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "azure": AzureOpenAIEmbedder,
+}
+
+
+def get_embedder(name=None, **kwargs):
+    """Build the embedder called ``name`` (default: ``GRAPH_EMBEDDER`` or ``hashing``)."""
+    name = name or os.getenv("GRAPH_EMBEDDER", "hashing")
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}', expected one of: {', '.join(EMBEDDERS)}")
+    if name == "hashing" and "dimensions" not in kwargs and os.getenv("GRAPH_EMBEDDING_DIMENSIONS"):
+        kwargs["dimensions"] = int(os.getenv("GRAPH_EMBEDDING_DIMENSIONS"))
+    return EMBEDDERS[name](**kwargs)
@@ -0,0 +1,233 @@
+import ast
+import hashlib
+import re
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Structural facts of Python files, extracted while the pipeline still holds
+# the raw source (``python_to_text`` replaces it with an explanation). The
+# graph builder reads these columns instead of parsing the file again. The
+# extraction mirrors graph/utilities/ast_to_json_parser.py; both sides check
+# STRUCTURE_VERSION, so bump it on both sides whenever the fields change.
+# tests/check_shared_code.py runs both extractors and reports any drift.
+STRUCTURE_VERSION = 1
+
+_LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+_STRINGS = pa.list_(pa.string())
+_CALLABLE = pa.struct([
+    ("name", pa.string()), ("content", pa.string()), ("args", _STRINGS), ("defaults", _STRINGS),
+    ("decorators", _STRINGS), ("lineno", pa.int64()), ("end_lineno", pa.int64()),
+])
+
+STRUCTURE_SCHEMA = pa.schema([
+    ("ast_version", pa.int32()),
+    ("ast_source_hash", pa.string()),
+    ("ast_line_count", pa.int64()),
+    ("ast_imports", pa.list_(pa.struct([("module", pa.string()), ("level", pa.int64()), ("names", _STRINGS)]))),
+    ("ast_classes", pa.list_(pa.struct([
+        ("name", pa.string()), ("decorators", _STRINGS), ("inheritances", _STRINGS),
+        ("lineno", pa.int64()), ("end_lineno", pa.int64()), ("methods", pa.list_(_CALLABLE)),
+    ]))),
+    ("ast_functions", pa.list_(_CALLABLE)),
+    ("ast_calls", pa.list_(pa.struct([
+        ("caller_function", pa.string()), ("caller_class", pa.string()),
+        ("called_function", pa.string()), ("receiver", pa.string()),
+    ]))),
+    ("ast_import_bindings", pa.list_(pa.struct([
+        ("alias", pa.string()), ("module", pa.string()), ("name", pa.string()), ("level", pa.int64()),
+    ]))),
+])
+
+STRUCTURE_COLUMNS = STRUCTURE_SCHEMA.names
+
+
+class StructureExtractor(ast.NodeVisitor):
+    """
+    Collects classes, methods, functions, calls and import bindings of a module.
+
+    Parameters:
+        source (str): The module source code.
+    """
+    def __init__(self, source: str):
+        self.code_lines = source.splitlines()
+        # Lines split the way the tokenizer counts them, so node offsets line up.
+        self.source_lines = _LINE_BREAK.split(source)
+        self.classes = []
+        self.functions = []
+        self.calls = []
+        self.import_bindings = {}
+        self.current_class = None
+        self.current_function = None
+
+    def get_source(self, node) -> str:
+        """Source text of an expression node (column offsets are UTF-8 byte offsets)."""
+        if getattr(node, 'end_lineno', None) == node.lineno:
+            line = self.source_lines[node.lineno - 1].encode('utf-8')
+            return line[node.col_offset:node.end_col_offset].decode('utf-8')
+        return ast.unparse(node)
+
+    def _callable(self, node) -> dict:
+        return {
+            'name': node.name,
+            'content': '\n'.join(self.code_lines[node.lineno - 1:node.end_lineno]) if self.code_lines else None,
+            'args': [arg.arg for arg in node.args.args],
+            'defaults': [self.get_source(default) for default in node.args.defaults],
+            'decorators': [self.get_source(dec) for dec in node.decorator_list],
+            'lineno': node.lineno,
+            'end_lineno': node.end_lineno,
+        }
+
+    def visit_ClassDef(self, node):
+        self.classes.append({
+            'name': node.name,
+            'decorators': [self.get_source(dec) for dec in node.decorator_list],
+            'inheritances': [self.get_source(base) for base in node.bases],
+            'lineno': node.lineno,
+            'end_lineno': node.end_lineno,
+            'methods': [self._callable(n) for n in node.body if isinstance(n, ast.FunctionDef)],
+        })
+        previous_class = self.current_class
+        self.current_class = node.name
+        self.generic_visit(node)
+        self.current_class = previous_class
+
+    def visit_FunctionDef(self, node):
+        if not self.current_class:
+            self.functions.append(self._callable(node))
+        previous_function = self.current_function
+        self.current_function = node.name
+        self.generic_visit(node)
+        self.current_function = previous_function
+
+    def visit_Call(self, node):
+        called_func = None
+        receiver = None
+        if isinstance(node.func, ast.Name):
+            called_func = node.func.id
+        elif isinstance(node.func, ast.Attribute):
+            called_func = node.func.attr
+            receiver = node.func.value.id if isinstance(node.func.value, ast.Name) else ''
+        if called_func and self.current_function:
+            self.calls.append({
+                'caller_function': self.current_function,
+                'caller_class': self.current_class,
+                'called_function': called_func,
+                'receiver': receiver,
+            })
+        self.generic_visit(node)
+
+    def get_imports(self, tree) -> list:
+        """Import statements as ``module``/``level``/``names`` entries; also records the bound names."""
+        imports = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports.append({'module': alias.name, 'level': 0, 'names': []})
+                    if alias.asname:
+                        self.import_bindings[alias.asname] = {'module': alias.name, 'name': None, 'level': 0}
+                    else:
+                        top_level = alias.name.split('.')[0]
+                        self.import_bindings[top_level] = {'module': top_level, 'name': None, 'level': 0}
+            elif isinstance(node, ast.ImportFrom):
+                imports.append({
+                    'module': node.module, 'level': node.level,
+                    'names': [alias.name for alias in node.names if alias.name != '*'],
+                })
+                for alias in node.names:
+                    if alias.name != '*':
+                        self.import_bindings[alias.asname or alias.name] = {
+                            'module': node.module, 'name': alias.name, 'level': node.level
+                        }
+        return imports
+
+
+def extract_structure(file_path: str, code: str):
+    """
+    Extracts the structure columns of one Python file.
+
+    Parameters:
+        file_path (str): Path of the file, for error messages.
+        code (str): Raw Python source code.
+
+    Returns:
+        dict: The ``ast_*`` column values, or None when the file does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+        extractor = StructureExtractor(code)
+        extractor.visit(tree)
+        imports = extractor.get_imports(tree)
+    except Exception as e:
+        print(f"Error parsing {file_path}: {e}")
+        return None
+    return {
+        'ast_version': STRUCTURE_VERSION,
+        'ast_source_hash': hashlib.sha256(str(code).encode('utf-8')).hexdigest(),
+        'ast_line_count': len(code.splitlines()),
+        'ast_imports': imports,
+        'ast_classes': extractor.classes,
+        'ast_functions': extractor.functions,
+        'ast_calls': extractor.calls,
+        'ast_import_bindings': [{'alias': alias, **binding} for alias, binding in extractor.import_bindings.items()],
+    }
+
+
+def add_structure_columns(df: pd.DataFrame, mask) -> int:
+    """
+    Adds the ``ast_*`` columns for the ``.py`` rows selected by ``mask``; other rows get nulls.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame with 'name' and 'content' columns, updated in place.
+        mask (pd.Series): Rows to extract.
+
+    Returns:
+        int: The number of files whose structure was extracted.
+    """
+    structures = {}
+    for index, row in df.loc[mask, ['name', 'content']].iterrows():
+        if str(row['name']).endswith('.py') and isinstance(row['content'], str):
+            structure = extract_structure(row['name'], row['content'])
+            if structure is not None:
+                structures[index] = structure
+    for column in STRUCTURE_COLUMNS:
+        df[column] = [structures[index][column] if index in structures else None for index in df.index]
+    return len(structures)
+
+
+def strip_bodies(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops method and function source from the structure columns.
+
+    Used when content is anonymized after the structure was extracted, so
+    no uncensored code leaves the pipeline through these columns.
+    """
+    def strip(callables):
+        return [{**c, 'content': None} for c in callables] if callables is not None else None
+
+    df['ast_functions'] = df['ast_functions'].apply(strip)
+    df['ast_classes'] = df['ast_classes'].apply(
+        lambda classes: [{**c, 'methods': strip(c['methods'])} for c in classes] if classes is not None else None
+    )
+    return df
+
+
+def write_parquet(df: pd.DataFrame, path: str):
+    """
+    Writes ``df`` to parquet, typing the ``ast_*`` columns with ``STRUCTURE_SCHEMA``.
+
+    Without structure columns this is ``DataFrame.to_parquet``. Column types
+    are fixed rather than inferred, so empty lists and all-null fields keep
+    the types the graph builder reads.
+    """
+    present = [column for column in STRUCTURE_COLUMNS if column in df.columns]
+    if not present:
+        df.to_parquet(path)
+        return
+    other = df.drop(columns=present)
+    schema = pa.schema(
+        list(pa.Schema.from_pandas(other, preserve_index=False)) + [STRUCTURE_SCHEMA.field(c) for c in present]
+    )
+    table = pa.Table.from_pandas(df[list(other.columns) + present], schema=schema, preserve_index=False)
+    pq.write_table(table, path)
@@ -7,6 +7,9 @@ from components.python_to_text_conversion.filtering.source.convert_notebook impo
 from components.md_to_txt.source.converter import FileConverter
 from components.cleaning_and_transformation.source.text_cleaner import TextCleaner
 from components.python_to_text_conversion.llm_explainer.source.python_explainer import CodeExplainer
+from components.python_to_text_conversion.structure.source.structure_extractor import (
+    add_structure_columns, strip_bodies, write_parquet, STRUCTURE_COLUMNS
+)
 import json
 
 json_path = "pipeline_extensions.json"
@@ -50,6 +53,9 @@ class ManageTransforming():
         print("Starting anonymization...")
         df = anonymizer.run_anonimizer_in_chunks(self.df, chunk_size=40)
         df = anonymizer.censor_content(df, content_col='content', coords_col='coordinates').drop(columns=['coordinates'], errors='ignore')
+        if set(STRUCTURE_COLUMNS) <= set(df.columns):
+            # Structure extracted earlier holds uncensored method and function source.
+            df = strip_bodies(df)
         self.df = df
         print("Anonymization completed.")
         return self.df
@@ -64,7 +70,11 @@ class ManageTransforming():
     async def _python_to_text(self) -> pd.DataFrame:
         exts = self.config.get("python_to_text", [])
         mask = self.df['name'].apply(lambda x: any(str(x).endswith(ext) for ext in exts))
-        
+
+        # Extract the structure the graph builder needs while the raw source is still here.
+        extracted = add_structure_columns(self.df, mask)
+        print(f"Extracted the structure of {extracted} Python files.")
+
         self.df.loc[mask, 'content'] = self.df.loc[mask, 'content'].apply(converter)
 
         if not self.keep_comments:
@@ -115,5 +125,5 @@ class ManageTransforming():
         for step in steps:
             print(f"Running step: {step}")
             self.df = await self.run_step(step)
-        self.df.to_parquet(f"{self.input_path.replace('.parquet','')}_processed.parquet")
+        write_parquet(self.df, f"{self.input_path.replace('.parquet','')}_processed.parquet")
         return {"message": "Pipeline executed successfully.", "path":f"{self.input_path.replace('.parquet','')}_processed.parquet"}
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""Checks that code shipped twice, once per service image, has not drifted apart.
+
+Each service builds from its own directory, so the graph builder and the
+transforming pipeline cannot import each other's modules. Run from the
+repository root; exits non-zero if anything has drifted:
+
+    python tests/check_shared_code.py [PATH ...]
+
+Copies: the query agents read the graph builder's body store and embed
+questions with its embedders, so ``COPIES`` must stay byte-identical.
+
+Structure extraction: the pipeline's ``structure_extractor`` and the graph
+builder's ``CodeEntityExtractor`` must produce the same extraction for
+every Python file under PATH (default: the repository), and agree on
+``STRUCTURE_VERSION``.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STRUCTURE_EXTRACTOR = (
+    ROOT / "microservices/transforming_pipeline/components/python_to_text_conversion/structure/source"
+    / "structure_extractor.py"
+)
+# (original, copy) pairs; edit the original and copy it over.
+COPIES = [
+    ("graph/utilities/body_store.py", "microservices/ai_layer/utilities/body_store.py"),
+    ("graph/utilities/embeddings.py", "microservices/ai_layer/utilities/embeddings.py"),
+]
+
+sys.path.insert(0, str(ROOT / "graph"))
+from utilities import ast_to_json_parser as graph_parser  # noqa: E402
+
+
+def _load(path):
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check_copies():
+    """Return the copies that differ from their original."""
+    drifted = [copy for original, copy in COPIES if (ROOT / original).read_bytes() != (ROOT / copy).read_bytes()]
+    print(f"Copies: {len(COPIES)} compared, {len(drifted)} differ")
+    return drifted
+
+
+def check_structure_extractor(paths):
+    """Compare both extractors on every ``.py`` file under ``paths``; returns the differing files."""
+    pipeline = _load(STRUCTURE_EXTRACTOR)
+    if pipeline.STRUCTURE_VERSION != graph_parser.STRUCTURE_VERSION:
+        return [f"STRUCTURE_VERSION {pipeline.STRUCTURE_VERSION} (pipeline) != "
+                f"{graph_parser.STRUCTURE_VERSION} (graph)"]
+    drifted = []
+    checked = 0
+    for root in paths:
+        for path in sorted(Path(root).rglob("*.py")):
+            try:
+                code = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            record = graph_parser._process_file(str(path), code)
+            structure = pipeline.extract_structure(str(path), code)
+            if record is None or structure is None:
+                if (record is None) != (structure is None):
+                    drifted.append(str(path))
+                continue
+            checked += 1
+            if graph_parser._extraction(record) != graph_parser._structure_extraction(structure):
+                drifted.append(str(path))
+    print(f"Structure extraction: {checked} files compared, {len(drifted)} differ")
+    return drifted
+
+
+def main(argv):
+    paths = argv or [str(ROOT)]
+    drifted = check_copies() + check_structure_extractor(paths)
+    for item in drifted:
+        print(f"  {item}")
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))